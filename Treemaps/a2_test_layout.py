@@ -0,0 +1,123 @@
+import unittest
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+from tm_trees import TMTree, FileSystemTree, SQUARIFIED
+from tm_layout import BackgroundLayout
+import treemap_visualiser
+
+
+def all_rectangles(tree):
+    result = []
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        result.append(item.rect)
+        stack.extend(item._subtrees)
+    return result
+
+
+class a2_test_background_layout(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join('example-directory', "workshop")
+        self.tree = FileSystemTree(path)
+        self.other = FileSystemTree(path)
+        for tree in (self.tree, self.other):
+            tree.expand_all()
+            tree.update_rectangles((0, 0, 200, 100), SQUARIFIED, 4)
+        self.finished = []
+        self.layout = BackgroundLayout(self.tree, self.finished.append)
+
+    def test_same_rectangles(self):
+        for tree in (self.tree, self.other):
+            leaf = tree.get_tree_at_position((1, 1))
+            leaf.change_size(0.5)
+        self.layout.start()
+        self.assertTrue(self.layout.wait(10))
+        self.assertTrue(self.layout.publish())
+        self.other.update_dirty_rectangles()
+        self.assertListEqual(all_rectangles(self.tree),
+                             all_rectangles(self.other))
+        self.assertEqual(self.layout.published, 1)
+        self.assertListEqual(self.finished, [1])
+        self.assertFalse(self.layout.publish())
+
+    def test_new_rect(self):
+        self.layout.start((5, 5, 300, 50))
+        self.layout.wait()
+        old = all_rectangles(self.tree)
+        self.assertTrue(self.layout.publish())
+        self.assertNotEqual(all_rectangles(self.tree), old)
+        self.other.update_rectangles((5, 5, 300, 50))
+        self.assertListEqual(all_rectangles(self.tree),
+                             all_rectangles(self.other))
+        self.assertEqual(self.tree.get_tree_at_position((6, 6)).rect[:2],
+                         (5, 5))
+
+    def test_cancel(self):
+        old = all_rectangles(self.tree)
+        self.layout.start((0, 0, 50, 50))
+        self.layout.wait()
+        self.assertTrue(self.layout.cancel())
+        self.assertFalse(self.layout.publish())
+        self.assertListEqual(all_rectangles(self.tree), old)
+        self.assertFalse(self.layout.cancel())
+        self.assertEqual(self.layout.published, 0)
+
+    def test_generations(self):
+        self.layout.start((0, 0, 50, 50))
+        self.assertEqual(self.layout.start((0, 0, 300, 300)), 2)
+        self.layout.wait()
+        self.assertTrue(self.layout.publish())
+        self.assertEqual(self.layout.published, 2)
+        self.assertEqual(self.tree.rect, (0, 0, 300, 300))
+        self.assertEqual(self.finished[-1], 2)
+
+
+class SlowScan:
+    """Stands in for a FileSystemScan of a tree too big to lay out between
+    two scan refreshes: each update changes the size of a leaf, and records
+    whether the layout started after the update before it had been applied.
+    """
+    def __init__(self, tree, updates):
+        self.tree = tree
+        self.updates = updates
+        self.dirty = []
+        self.done = False
+        self.folders_read = 0
+        self.files_found = 0
+
+    def update(self, time_limit=None):
+        if self.folders_read > 0:
+            self.dirty.append(self.tree._dirty)
+        self.tree._subtrees[self.folders_read].change_size(0.5)
+        self.folders_read += 1
+        if self.folders_read == self.updates:
+            self.done = True
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+        return True
+
+
+class a2_test_scan_refresh(unittest.TestCase):
+    def setUp(self):
+        self.refresh_time = treemap_visualiser.SCAN_REFRESH_TIME
+        treemap_visualiser.SCAN_REFRESH_TIME = 1
+        self.screen = treemap_visualiser._start_pygame()
+
+    def tearDown(self):
+        treemap_visualiser.SCAN_REFRESH_TIME = self.refresh_time
+        pygame.quit()
+
+    def test_slow_layout_is_drawn(self):
+        tree = TMTree('root', [TMTree(str(i), [], i % 97 + 2)
+                               for i in range(30000)])
+        tree.update_rectangles((0, 0, treemap_visualiser.WIDTH,
+                                treemap_visualiser.TREEMAP_HEIGHT),
+                               SQUARIFIED, 4)
+        scan = SlowScan(tree, 4)
+        rendered, _ = treemap_visualiser.event_loop(self.screen, tree, scan)
+        self.assertListEqual(scan.dirty, [False] * 3)
+        self.assertGreaterEqual(rendered, 4)
+
+
+unittest.main(exit=False)
@@ -0,0 +1,125 @@
+import unittest
+import os
+from tm_trees import FileSystemTree, SQUARIFIED
+from tm_store import TMStore
+try:
+    import numpy
+    import tm_raster
+except ImportError:
+    tm_raster = None
+
+
+def painted_ids(rects, size):
+    result = [[-1] * size[1] for _ in range(size[0])]
+    for i, (x, y, width, height) in enumerate(rects):
+        for px in range(max(x, 0), min(x + width, size[0])):
+            for py in range(max(y, 0), min(y + height, size[1])):
+                result[px][py] = i
+    return result
+
+
+@unittest.skipIf(tm_raster is None, 'NumPy is not installed')
+class a2_test_pixel_ids(unittest.TestCase):
+    def setUp(self):
+        self.tree = FileSystemTree(os.path.join('example-directory',
+                                                "workshop"))
+        self.tree.expand_all()
+
+    def test_leaf_rectangles(self):
+        self.tree.update_rectangles((0, 0, 200, 100))
+        leaves = []
+        rects, colours = tm_raster.leaf_rectangles(self.tree, leaves.append)
+        exp = self.tree.get_rectangles()
+        self.assertEqual(len(leaves), len(exp))
+        self.assertListEqual([tuple(rect) for rect in rects.tolist()],
+                             [rect for rect, _ in exp])
+        self.assertListEqual([tuple(colour) for colour in colours.tolist()],
+                             [colour for _, colour in exp])
+
+    def test_treemap(self):
+        for layout in (None, SQUARIFIED):
+            self.tree.update_rectangles((3, 2, 50, 40), layout)
+            rects, _ = tm_raster.leaf_rectangles(self.tree)
+            self.assertListEqual(tm_raster.pixel_ids(rects, (60, 45)).tolist(),
+                                 painted_ids(rects.tolist(), (60, 45)))
+
+    def test_clipped_and_overlapping(self):
+        rects = [(-5, -5, 10, 10), (3, 3, 10, 10), (8, 0, 0, 5),
+                 (15, 10, 10, -3), (6, 1, 20, 2)]
+        ids = tm_raster.pixel_ids(numpy.array(rects), (20, 12))
+        self.assertListEqual(ids.tolist(), painted_ids(rects, (20, 12)))
+
+    def test_no_rectangles(self):
+        ids = tm_raster.pixel_ids(numpy.zeros((0, 4), dtype=int), (4, 3))
+        self.assertEqual(ids.shape, (4, 3))
+        self.assertTrue(numpy.all(ids == tm_raster.BACKGROUND))
+
+    def test_pixel_colours(self):
+        ids = numpy.array([[0, -1], [1, 1]])
+        colours = numpy.array([[1, 2, 3], [4, 5, 6]], dtype=numpy.uint8)
+        self.assertListEqual(tm_raster.pixel_colours(ids, colours,
+                                                     (9, 9, 9)).tolist(),
+                             [[[1, 2, 3], [9, 9, 9]],
+                              [[4, 5, 6], [4, 5, 6]]])
+
+
+@unittest.skipIf(tm_raster is None, 'NumPy is not installed')
+class a2_test_pixel_map(unittest.TestCase):
+    def setUp(self):
+        self.tree = FileSystemTree(os.path.join('example-directory',
+                                                "workshop"))
+        self.tree.expand_all()
+        self.tree.update_rectangles((0, 0, 200, 100))
+        self.pixels = tm_raster.PixelMap(self.tree, (200, 100))
+
+    def test_leaves(self):
+        self.assertEqual(len(self.pixels.leaves), 6)
+        self.assertListEqual([leaf.rect for leaf in self.pixels.leaves],
+                             [rect for rect, _ in
+                              self.tree.get_rectangles()])
+        self.assertEqual(self.pixels.ids.shape, (200, 100))
+        self.assertEqual(self.pixels.ids.dtype, numpy.int32)
+
+    def test_leaf_at(self):
+        for leaf in self.pixels.leaves:
+            x, y, width, height = leaf.rect
+            for pos in [(x, y), (x + width - 1, y + height - 1),
+                        (x + width // 2, y + height // 2)]:
+                self.assertIs(self.pixels.leaf_at(pos), leaf)
+                if pos != (x, y):
+                    self.assertIs(self.tree.get_tree_at_position(pos), leaf)
+
+    def test_outside(self):
+        for pos in [(-1, 0), (0, -1), (200, 0), (0, 100), (500, 500)]:
+            self.assertIsNone(self.pixels.leaf_at(pos))
+        self.tree.update_rectangles((0, 0, 100, 50))
+        pixels = tm_raster.PixelMap(self.tree, (200, 100))
+        self.assertIsNone(pixels.leaf_at((150, 75)))
+        self.assertIsNotNone(pixels.leaf_at((50, 25)))
+
+    def test_collapsed(self):
+        self.pixels.leaves[0].collapse_all()
+        pixels = tm_raster.PixelMap(self.tree, (200, 100))
+        self.assertListEqual(pixels.leaves, [self.tree])
+        self.assertIs(pixels.leaf_at((199, 99)), self.tree)
+
+    def test_pixel_colours(self):
+        colours = self.pixels.pixel_colours()
+        for leaf in self.pixels.leaves:
+            x, y, _, _ = leaf.rect
+            self.assertEqual(tuple(colours[x, y]), leaf._colour)
+
+    def test_store(self):
+        store = TMStore.from_tree(self.tree)
+        store.update_rectangles((0, 0, 200, 100))
+        pixels = tm_raster.PixelMap(store.root(), (200, 100))
+        self.assertTrue(all(isinstance(leaf, int) for leaf in pixels.leaves))
+        self.assertEqual(len(store._views), 0)
+        self.assertTrue(numpy.array_equal(pixels.ids, self.pixels.ids))
+        for i in pixels.leaves:
+            x, y, width, height = store._rect(i)
+            self.assertIs(pixels.leaf_at((x + width // 2, y + height // 2)),
+                          store.view(i))
+
+
+unittest.main(exit=False)
@@ -0,0 +1,34 @@
+import unittest
+import os
+import tempfile
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+from treemap_render import render_file_system, render_file_systems
+
+
+class a2_test_render(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join('example-directory', 'workshop')
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_render_file_system(self):
+        filename = os.path.join(self.folder.name, 'workshop.png')
+        self.assertEqual(render_file_system(self.path, filename, (320, 200)),
+                         filename)
+        self.assertEqual(pygame.image.load(filename).get_size(), (320, 200))
+
+    def test_render_file_systems(self):
+        jobs = [(self.path, os.path.join(self.folder.name, 'all.png')),
+                (os.path.join(self.path, 'prep'),
+                 os.path.join(self.folder.name, 'prep.png'))]
+        self.assertListEqual(render_file_systems(jobs, (160, 90), processes=2),
+                             [filename for _, filename in jobs])
+        for _, filename in jobs:
+            self.assertEqual(pygame.image.load(filename).get_size(),
+                             (160, 90))
+
+
+unittest.main(exit=False)
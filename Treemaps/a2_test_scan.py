@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+from tm_trees import FileSystemTree
+from tm_scan import FileSystemScan
+import treemap_visualiser
+
+
+def path_sizes(tree):
+    result = []
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        result.append((item.get_path_string(), item.data_size))
+        stack.extend(item._subtrees)
+    return sorted(result)
+
+
+def finish(scan):
+    start = time.perf_counter()
+    while not scan.done:
+        scan.update()
+        if time.perf_counter() - start > 10:
+            raise AssertionError('the scan did not finish')
+        time.sleep(0.001)
+
+
+class a2_test_file_system_scan(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join('example-directory', "workshop")
+
+    def test_same_tree(self):
+        for workers in (1, 4):
+            scan = FileSystemScan(self.path, workers)
+            finish(scan)
+            self.assertEqual(scan.folders_read, 5)
+            self.assertEqual(scan.files_found, 6)
+            self.assertListEqual(path_sizes(scan.tree),
+                                 path_sizes(FileSystemTree(self.path)))
+
+    def test_progressive_layout(self):
+        scan = FileSystemScan(self.path)
+        scan.tree.expand()
+        scan.tree.update_rectangles((0, 0, 200, 100))
+        sizes = []
+        while not scan.done:
+            if scan.update():
+                scan.tree.expand_all()
+                scan.tree.update_dirty_rectangles((0, 0, 200, 100))
+                sizes.append(scan.tree.data_size)
+        self.assertEqual(sizes[-1], 151)
+        self.assertListEqual(sizes, sorted(sizes))
+        rectangles = scan.tree.get_rectangles()
+        scan.tree.update_rectangles((0, 0, 200, 100))
+        self.assertListEqual(scan.tree.get_rectangles(), rectangles)
+        self.assertEqual(len(rectangles), 6)
+
+    def test_file(self):
+        scan = FileSystemScan(os.path.join(self.path, 'draft.pptx'))
+        self.assertTrue(scan.done)
+        self.assertFalse(scan.update())
+        self.assertEqual(scan.tree.data_size, 58)
+
+    def test_stop(self):
+        scan = FileSystemScan(self.path)
+        scan.stop()
+        self.assertTrue(scan.done)
+        self.assertFalse(scan.update())
+        self.assertLessEqual(scan.tree.data_size, 151)
+
+
+class a2_test_failed_scan(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        shutil.copytree(os.path.join('example-directory', 'workshop'),
+                        os.path.join(self.folder, 'workshop'))
+        with open(os.path.join(self.folder, 'notes.txt'), 'w') as notes:
+            notes.write('read before the scan fails')
+        # A link to nothing cannot be read, so the scan fails on its folder
+        os.mkdir(os.path.join(self.folder, 'broken'))
+        os.symlink(os.path.join(self.folder, 'missing'),
+                   os.path.join(self.folder, 'broken', 'link'))
+        self.screen = treemap_visualiser._start_pygame()
+
+    def tearDown(self):
+        pygame.quit()
+        shutil.rmtree(self.folder)
+
+    def quit_when_done(self, scan):
+        while not scan.done:
+            time.sleep(0.01)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    def test_event_loop_keeps_tree(self):
+        scan = FileSystemScan(self.folder)
+        scan.tree.update_rectangles((0, 0, treemap_visualiser.WIDTH,
+                                     treemap_visualiser.TREEMAP_HEIGHT))
+        quitter = threading.Thread(target=self.quit_when_done, args=(scan,))
+        quitter.start()
+        treemap_visualiser.event_loop(self.screen, scan.tree, scan)
+        quitter.join()
+        self.assertTrue(scan.done)
+        self.assertGreaterEqual(scan.tree.data_size, 26)
+        self.assertLessEqual(scan.tree.data_size, 26 + 151)
+        self.assertGreater(scan.tree.rect[2] * scan.tree.rect[3], 0)
+        self.assertIsNotNone(scan.tree.get_tree_at_position((1, 1)))
+        self.assertIn('Scan failed',
+                      treemap_visualiser._get_display_text(
+                          None, scan, OSError('unreadable')))
+
+
+unittest.main(exit=False)
@@ -0,0 +1,148 @@
+import unittest
+import os
+from tm_trees import TMTree, FileSystemTree, SQUARIFIED
+import tm_store
+from tm_store import TMStore
+
+
+def path_strings(tree):
+    result = [tree.get_path_string()]
+    for sub in tree._subtrees:
+        result.extend(path_strings(sub))
+    return result
+
+
+def store_path_strings(store):
+    result = []
+    stack = [0]
+    while stack:
+        i = stack.pop()
+        result.append(store.get_path_string(i))
+        stack.extend(reversed(store._children(i)))
+    return result
+
+
+class a2_test_tm_store(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join('example-directory', "workshop")
+        self.tree = FileSystemTree(self.path)
+        self.tree.expand_all()
+        self.tree.update_rectangles((0, 0, 200, 100))
+        self.store = TMStore.from_tree(self.tree)
+
+    def test_from_tree(self):
+        self.assertEqual(len(self.store), 11)
+        self.assertEqual(self.store.root().data_size, 151)
+        self.assertListEqual(self.store.get_rectangles(),
+                             self.tree.get_rectangles())
+        self.assertListEqual(store_path_strings(self.store),
+                             path_strings(self.tree))
+
+    def test_from_file_system(self):
+        store = TMStore.from_file_system(self.path)
+        self.assertEqual(len(store), 11)
+        self.assertEqual(store.root().data_size, 151)
+        self.assertListEqual(store_path_strings(store),
+                             path_strings(self.tree))
+
+    def test_update_rectangles(self):
+        for layout in (SQUARIFIED, None):
+            self.tree.update_rectangles((5, 5, 333, 222), layout)
+            self.store.update_rectangles((5, 5, 333, 222), layout)
+            self.assertListEqual(self.store.get_rectangles(),
+                                 self.tree.get_rectangles())
+
+    def test_get_tree_at_position(self):
+        for x in range(0, 201, 7):
+            for y in range(0, 101, 7):
+                exp = self.tree.get_tree_at_position((x, y))
+                act = self.store.get_tree_at_position((x, y))
+                self.assertEqual(act.get_path_string(), exp.get_path_string())
+        self.assertIsNone(self.store.get_tree_at_position((201, 0)))
+        self.assertIs(self.store.get_tree_at_position((1, 1)),
+                      self.store.get_tree_at_position((2, 2)))
+
+    def test_change_size_and_move(self):
+        leaf = self.tree.get_tree_at_position((1, 1))
+        view = self.store.get_tree_at_position((1, 1))
+        leaf.change_size(0.5)
+        view.change_size(0.5)
+        self.assertEqual(view.data_size, leaf.data_size)
+        self.assertEqual(self.store.root().data_size, self.tree.data_size)
+        leaf.move(self.tree._subtrees[0])
+        view.move(self.store.view(1))
+        self.assertEqual(self.store.update_data_sizes(),
+                         self.tree.update_data_sizes())
+        self.tree.update_rectangles((0, 0, 200, 100))
+        self.store.update_rectangles((0, 0, 200, 100))
+        self.assertListEqual(self.store.get_rectangles(),
+                             self.tree.get_rectangles())
+        self.assertListEqual(store_path_strings(self.store),
+                             path_strings(self.tree))
+
+    def test_move_nowhere(self):
+        sizes = [self.store.view(i).data_size for i in range(len(self.store))]
+        for i in range(len(self.store)):
+            self.store.view(i).move(None)
+        self.assertListEqual([self.store.view(i).data_size
+                              for i in range(len(self.store))], sizes)
+        self.assertListEqual(store_path_strings(self.store),
+                             path_strings(self.tree))
+
+    def test_expand_and_collapse(self):
+        root = self.store.root()
+        leaf = self.store.get_tree_at_position((199, 99))
+        leaf.collapse_all()
+        self.assertEqual(len(self.store.get_rectangles()), 1)
+        root.expand()
+        self.assertEqual(len(self.store.get_rectangles()), 3)
+        root.expand_all()
+        self.assertEqual(len(self.store.get_rectangles()), 6)
+        self.store.view(1).collapse()
+        self.assertEqual(len(self.store.get_rectangles()), 1)
+
+    def test_empty_tree(self):
+        store = TMStore.from_tree(TMTree(None, []))
+        store.update_rectangles((0, 0, 10, 10))
+        self.assertTrue(store.root().is_empty())
+        self.assertListEqual(store.get_rectangles(), [])
+        self.assertIsNone(store.get_tree_at_position((1, 1)))
+
+
+@unittest.skipIf(tm_store.numpy is None, 'NumPy is not installed')
+class a2_test_numpy_layout(unittest.TestCase):
+    def setUp(self):
+        self.tree = FileSystemTree(os.path.join('example-directory',
+                                                "workshop"))
+        self.tree._subtrees[-1].data_size = 0
+
+    def layout_without_numpy(self, store, rect):
+        numpy = tm_store.numpy
+        tm_store.numpy = None
+        try:
+            store.update_rectangles(rect)
+        finally:
+            tm_store.numpy = numpy
+        return [store._rect(i) for i in range(len(store))]
+
+    def test_same_rectangles(self):
+        for rect in [(0, 0, 200, 100), (3, 7, 97, 333), (0, 0, 0, 0)]:
+            store = TMStore.from_tree(self.tree)
+            exp = self.layout_without_numpy(store, rect)
+            store = TMStore.from_tree(self.tree)
+            store.update_rectangles(rect)
+            self.assertListEqual([store._rect(i) for i in range(len(store))],
+                                 exp)
+
+    def test_same_rectangles_after_move(self):
+        store = TMStore.from_tree(self.tree)
+        store.view(len(store) - 1).move(store.root())
+        store.view(2).move(store.view(1))
+        exp = self.layout_without_numpy(store, (0, 0, 640, 480))
+        store.update_rectangles((1, 1, 10, 10))
+        store.update_rectangles((0, 0, 640, 480))
+        self.assertListEqual([store._rect(i) for i in range(len(store))],
+                             exp)
+
+
+unittest.main(exit=False)
@@ -1,6 +1,8 @@
 import unittest
 import os
-from tm_trees import TMTree, FileSystemTree
+import json
+import tempfile
+from tm_trees import TMTree, FileSystemTree, SLICE_AND_DICE, SQUARIFIED
 
 
 def repr_tree(tree:TMTree):
@@ -61,5 +63,56 @@ class a2_test_part1_and_part2(unittest.TestCase):
         t = TMTree('Easy4.0', [subtree1, subtree2], 666)
         self.assertEqual(t.data_size, 3000, 'non-leaf data size is wrong')
 
+    def test_compact_nodes(self):
+        leaf = TMTree('leaf', [], 10)
+        leaf2 = TMTree('leaf2', [], 20)
+        folder = TMTree('folder', [leaf, leaf2])
+        self.assertFalse(hasattr(leaf, '__dict__'))
+        self.assertFalse(hasattr(self.FileTree, '__dict__'))
+        self.assertIs(leaf._subtrees, leaf2._subtrees)
+        self.assertListEqual(leaf._subtrees, [])
+        self.assertRaises(TypeError, leaf._subtrees.append, leaf2)
+        self.assertIsNot(folder._subtrees, leaf._subtrees)
+
+    def test_layout_state_on_root(self):
+        leaf = TMTree('leaf', [], 10)
+        folder = TMTree('folder', [leaf, TMTree('leaf2', [], 20)])
+        folder.update_rectangles((0, 0, 30, 20), SQUARIFIED, 7)
+        root = TMTree('root', [folder, TMTree('leaf3', [], 5)])
+        self.assertIsNone(folder._state)
+        self.assertEqual(leaf._layout, SLICE_AND_DICE)
+        leaf.update_rectangles((0, 0, 5, 5), SQUARIFIED, 7)
+        self.assertIsNone(leaf._state)
+        self.assertIsNotNone(root._state)
+        self.assertEqual(folder._layout, SQUARIFIED)
+        self.assertEqual(folder._min_area, 7)
+
+    def test_parallel_scan(self):
+        act = repr_tree(FileSystemTree(self.path, 4))
+        self.assertListEqual(act, repr_tree(self.FileTree))
+
+    def test_scan_cache(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache_file = os.path.join(folder, 'cache.json')
+            act = repr_tree(FileSystemTree(self.path, 1, cache_file))
+            self.assertListEqual(act, repr_tree(self.FileTree))
+            with open(cache_file) as file:
+                cache = json.load(file)
+            prep = os.path.abspath(os.path.join(self.path, 'prep'))
+            for entry in cache[prep][1]:
+                if entry[0] == 'reading.md':
+                    entry[2] = 1000
+            with open(cache_file, 'w') as file:
+                json.dump(cache, file)
+            tree = FileSystemTree(self.path, 1, cache_file)
+            self.assertEqual(tree.data_size, 151 - 6 + 1000,
+                             'an unchanged folder should come from the cache')
+            cache[prep][0] = [0, 0]
+            with open(cache_file, 'w') as file:
+                json.dump(cache, file)
+            tree = FileSystemTree(self.path, 1, cache_file)
+            self.assertEqual(tree.data_size, 151,
+                             'a changed folder should be read again')
+
 
 unittest.main(exit=False)
@@ -1,6 +1,7 @@
 import unittest
 import os
-from tm_trees import TMTree, FileSystemTree
+import sys
+from tm_trees import TMTree, FileSystemTree, SLICE_AND_DICE, SQUARIFIED
 
 def repr_tree(tree:TMTree):
     parent_name = "None" if tree._parent_tree is None else tree._parent_tree._name
@@ -409,5 +410,129 @@ class a2_test_task2(unittest.TestCase):
                               "For task 5 you should return every leaf in the DISPLAYED tree")
 
 
+class a2_test_layout_engines(unittest.TestCase):
+    def test_default_is_slice_and_dice(self):
+        leaf = TMTree("leaf", [], 30)
+        leaf2 = TMTree("leaf2", [], 70)
+        root = TMTree("root", [leaf, leaf2], 0)
+        root.update_rectangles((0, 0, 1000, 100))
+        self.assertEqual(root._layout, SLICE_AND_DICE)
+        self.assertEqual(leaf.rect, (0, 0, 300, 100))
+        self.assertEqual(leaf2.rect, (300, 0, 700, 100))
+
+    def test_squarified(self):
+        sizes = [6, 6, 4, 3, 2, 2, 1]
+        leaves = [TMTree("leaf" + str(i), [], sizes[i]) for i in range(7)]
+        root = TMTree("root", leaves, 0)
+        root.update_rectangles((0, 0, 600, 400), SQUARIFIED)
+        exp = [(0, 0, 300, 200), (0, 200, 300, 200), (300, 0, 171, 233),
+               (471, 0, 129, 233), (300, 233, 120, 167), (420, 233, 120, 167),
+               (540, 233, 60, 167)]
+        self.assertListEqual([leaf.rect for leaf in leaves], exp)
+
+    def test_squarified_fills_rect(self):
+        leaves = [TMTree("leaf" + str(i), [], i * 7 % 13 + 1)
+                  for i in range(40)]
+        root = TMTree("root", leaves, 0)
+        rect = (5, 10, 317, 211)
+        root.update_rectangles(rect, SQUARIFIED)
+        self.assertEqual(sum(leaf.rect[2] * leaf.rect[3] for leaf in leaves),
+                         rect[2] * rect[3])
+        for leaf in leaves:
+            self.assertTrue(rect[0] <= leaf.rect[0] and
+                            leaf.rect[0] + leaf.rect[2] <= rect[0] + rect[2])
+            self.assertTrue(rect[1] <= leaf.rect[1] and
+                            leaf.rect[1] + leaf.rect[3] <= rect[1] + rect[3])
+
+    def test_layout_is_remembered(self):
+        leaf = TMTree("leaf", [], 10)
+        leaf2 = TMTree("leaf2", [], 10)
+        folder = TMTree("folder", [leaf, leaf2], 0)
+        leaf3 = TMTree("leaf3", [], 20)
+        root = TMTree("root", [folder, leaf3], 0)
+        root.update_rectangles((0, 0, 100, 50), SQUARIFIED)
+        self.assertEqual(folder._layout, SQUARIFIED)
+        first = [leaf.rect, leaf2.rect, leaf3.rect]
+        root.update_rectangles((0, 0, 100, 50))
+        self.assertListEqual([leaf.rect, leaf2.rect, leaf3.rect], first)
+
+    def test_unknown_layout(self):
+        root = TMTree("root", [TMTree("leaf", [], 10)], 0)
+        self.assertRaises(ValueError, root.update_rectangles, (0, 0, 10, 10),
+                          "spiral")
+
+
+class a2_test_iter_rectangles(unittest.TestCase):
+    def setUp(self):
+        self.tree = FileSystemTree(os.path.join('example-directory',
+                                                'workshop'))
+        self.tree.expand_all()
+        self.tree.update_rectangles((0, 0, 200, 100))
+
+    def test_same_as_get_rectangles(self):
+        rectangles = self.tree.iter_rectangles()
+        self.assertNotIsInstance(rectangles, list)
+        self.assertListEqual(list(rectangles), self.tree.get_rectangles())
+
+    def test_visitor(self):
+        visited = []
+        for rect, colour in self.tree.iter_rectangles(visited.append):
+            self.assertEqual(visited[-1].rect, rect)
+            self.assertEqual(visited[-1]._colour, colour)
+        self.assertEqual(len(visited), 6)
+        self.assertTrue(all(leaf._subtrees == [] for leaf in visited))
+
+
+class a2_test_min_area(unittest.TestCase):
+    def setUp(self):
+        self.leaves = [TMTree("leaf" + str(i), [], 1) for i in range(10)]
+        self.folder = TMTree("folder", self.leaves, 0)
+        self.leaf = TMTree("big", [], 90)
+        self.root = TMTree("root", [self.folder, self.leaf], 0)
+        self.root.expand_all()
+
+    def test_small_folder_is_culled(self):
+        self.root.update_rectangles((0, 0, 100, 5), None, 100)
+        self.assertEqual(self.folder.rect, (0, 0, 10, 5))
+        self.assertListEqual(self.root.get_rectangles(),
+                             [(self.folder.rect, self.folder._colour),
+                              (self.leaf.rect, self.leaf._colour)])
+        self.assertIs(self.root.get_tree_at_position((5, 5)), self.folder)
+        self.assertListEqual([leaf.rect for leaf in self.leaves],
+                             [(0, 0, 0, 0)] * 10)
+
+    def test_min_area_is_remembered(self):
+        self.root.update_rectangles((0, 0, 100, 5), None, 100)
+        self.root.update_rectangles((0, 0, 1000, 100))
+        self.assertEqual(self.folder._min_area, 100)
+        self.assertEqual(len(self.root.get_rectangles()), 11)
+        self.leaf.change_size(-0.99)
+        self.root.update_dirty_rectangles()
+        self.assertEqual(len(self.root.get_rectangles()), 11)
+        self.root.update_rectangles((0, 0, 20, 5))
+        self.assertEqual(len(self.root.get_rectangles()), 2)
+        self.root.update_rectangles((0, 0, 20, 5), None, 0)
+        self.assertEqual(len(self.root.get_rectangles()), 11)
+
+
+class a2_test_deep_trees(unittest.TestCase):
+    def setUp(self):
+        self.depth = sys.getrecursionlimit() * 3
+        self.leaf = TMTree("leaf", [], 10)
+        self.root = self.leaf
+        for i in range(self.depth):
+            self.root = TMTree("folder" + str(i),
+                               [self.root, TMTree("file", [], 10)], 0)
+
+    def test_deep_layout(self):
+        self.root.expand_all()
+        self.root.update_rectangles((0, 0, 10 ** 6, 10 ** 6))
+        self.assertEqual(self.root.update_data_sizes(), 10 * (self.depth + 1))
+        self.assertEqual(len(self.root.get_rectangles()), self.depth + 1)
+        self.assertIs(self.root.get_tree_at_position((0, 0)), self.leaf)
+        self.root.collapse()
+        self.assertEqual(len(self.root.get_rectangles()), 1)
+
+
 unittest.main(exit=False)
 
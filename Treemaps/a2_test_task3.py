@@ -1,5 +1,7 @@
 import unittest
+import tm_trees
 from tm_trees import *
+from tm_trees import _PositionIndex
 from a2_test_task2 import set_expanded, is_leaf,set_size
 
 def eq_tree(tree1, tree2):
@@ -187,4 +189,137 @@ class a2_test_task3(unittest.TestCase):
                          "The leaf is the only qualified leaf in the DISPLAYED Tree YOUR RESULT IS " + act._name)
 
 
+class a2_test_position_index(unittest.TestCase):
+    def setUp(self):
+        self.leaves = [TMTree("leaf" + str(i), [], 10) for i in range(4)]
+        self.folderA = TMTree("folderA", self.leaves[:2], 0)
+        self.folderB = TMTree("folderB", self.leaves[2:], 0)
+        self.root = TMTree("root", [self.folderA, self.folderB], 0)
+        self.root.update_rectangles((0, 0, 100, 100))
+
+    def test_matches_walk(self):
+        set_expanded(self.root)
+        for x in range(0, 101, 5):
+            for y in range(0, 101, 5):
+                self.assertIs(self.root.get_tree_at_position((x, y)),
+                              self.root.get_tree_at_position_he((x, y)))
+
+    def test_expand_after_lookup(self):
+        self.root.expand()
+        self.assertIs(self.root.get_tree_at_position((10, 10)), self.folderA)
+        self.folderA.expand()
+        self.assertIs(self.root.get_tree_at_position((10, 10)),
+                      self.leaves[0])
+
+    def test_collapse_after_lookup(self):
+        set_expanded(self.root)
+        self.assertIs(self.root.get_tree_at_position((10, 60)),
+                      self.leaves[2])
+        self.folderB.collapse()
+        self.assertIs(self.root.get_tree_at_position((10, 60)), self.root)
+
+    def test_move_and_relayout(self):
+        set_expanded(self.root)
+        self.assertIs(self.root.get_tree_at_position((10, 10)),
+                      self.leaves[0])
+        self.leaves[0].move(self.folderB)
+        self.root.update_dirty_rectangles()
+        self.assertIs(self.root.get_tree_at_position((90, 90)),
+                      self.leaves[0])
+
+    def test_slice_and_dice_walks(self):
+        leaves = [TMTree("leaf" + str(i), [], i % 5 + 1) for i in range(2000)]
+        root = TMTree("root", leaves, 0)
+        root.update_rectangles((0, 0, 800, 570))
+        for x in range(0, 801, 7):
+            self.assertIs(root.get_tree_at_position((x, 300)),
+                          root.get_tree_at_position_he((x, 300)))
+        self.assertIsNone(root._state.position_index)
+
+    def test_zero_area_not_listed(self):
+        leaves = [TMTree("leaf" + str(i), [], i % 3) for i in range(30)]
+        root = TMTree("root", leaves, 0)
+        root.update_rectangles((0, 0, 100, 100), SQUARIFIED)
+        set_expanded(root)
+        index = _PositionIndex(root)
+        listed = set()
+        for cell in index._cells:
+            listed.update(index._trees[i] for i in cell)
+        self.assertSetEqual(listed, {leaf for leaf in leaves
+                                     if leaf.rect[2] * leaf.rect[3] > 0})
+
+    def test_index_built_after_lookups(self):
+        self.root.update_rectangles((0, 0, 100, 100), SQUARIFIED)
+        set_expanded(self.root)
+        for _ in range(tm_trees.LOOKUPS_BEFORE_INDEX - 1):
+            self.assertIs(self.root.get_tree_at_position((10, 10)),
+                          self.leaves[0])
+        self.assertIsNone(self.root._state.position_index)
+        self.assertIs(self.root.get_tree_at_position((10, 10)),
+                      self.leaves[0])
+        self.assertIsNotNone(self.root._state.position_index)
+        self.root.update_dirty_rectangles()
+        self.assertIsNone(self.root._state.position_index)
+        self.assertEqual(self.root._state.lookups, 0)
+
+    def test_miss_keeps_index(self):
+        leaves = [TMTree("leaf" + str(i), [], 1 if i % 4 else 1000)
+                  for i in range(40)]
+        root = TMTree("root", leaves, 0)
+        root.update_rectangles((0, 0, 50, 50), SQUARIFIED)
+        set_expanded(root)
+        self.assertTrue(any(leaf.rect[2] * leaf.rect[3] == 0
+                            for leaf in leaves))
+        for _ in range(tm_trees.LOOKUPS_BEFORE_INDEX):
+            root.get_tree_at_position((25, 25))
+        index = root._state.position_index
+        self.assertIsNotNone(index)
+        for x in range(51):
+            for y in range(51):
+                self.assertIsNotNone(root.get_tree_at_position((x, y)))
+        self.assertIs(root._state.position_index, index)
+        # No rectangle in the index contains any position any more
+        index._cells = [[] for _ in index._cells]
+        self.assertIs(root.get_tree_at_position((10, 10)),
+                      root.get_tree_at_position_he((10, 10)))
+        self.assertIs(root._state.position_index, index)
+
+    def test_too_many_cell_entries(self):
+        max_entries = tm_trees.MAX_CELL_ENTRIES_PER_TREE
+        tm_trees.MAX_CELL_ENTRIES_PER_TREE = 0
+        try:
+            self.root.update_rectangles((0, 0, 100, 100), SQUARIFIED)
+            set_expanded(self.root)
+            self.assertIsNone(_PositionIndex(self.root)._cells)
+            for x in range(0, 101, 5):
+                self.assertIs(self.root.get_tree_at_position((x, 40)),
+                              self.root.get_tree_at_position_he((x, 40)))
+        finally:
+            tm_trees.MAX_CELL_ENTRIES_PER_TREE = max_entries
+
+
+class a2_test_child_offsets(unittest.TestCase):
+    def test_offsets(self):
+        leaves = [TMTree("leaf" + str(i), [], i % 3) for i in range(6)]
+        root = TMTree("root", leaves, 0)
+        root.update_rectangles((10, 0, 120, 50))
+        self.assertListEqual(root._offsets, [10, 10, 30, 70, 70, 90])
+        root.update_rectangles((10, 0, 120, 50), SQUARIFIED)
+        self.assertIsNone(root._offsets)
+
+    def test_shared_edges(self):
+        leaves = [TMTree("leaf" + str(i), [], (i * 5) % 7) for i in range(50)]
+        root = TMTree("root", leaves, 0)
+        root.update_rectangles((0, 0, 50, 500))
+        set_expanded(root)
+        for y in range(501):
+            exp = None
+            for leaf in leaves:
+                if leaf.rect[0] <= 25 <= leaf.rect[0] + leaf.rect[2] and \
+                        leaf.rect[1] <= y <= leaf.rect[1] + leaf.rect[3]:
+                    exp = leaf
+                    break
+            self.assertIs(root.get_tree_at_position_he((25, y)), exp)
+
+
 unittest.main(exit=False)
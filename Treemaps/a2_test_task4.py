@@ -1,4 +1,5 @@
 import unittest
+import os
 from tm_trees import *
 from a2_test_task2 import set_expanded, is_leaf
 
@@ -234,4 +235,112 @@ class a2_test_move(unittest.TestCase):
 
 
 
+class a2_test_dirty_relayout(unittest.TestCase):
+    def setUp(self):
+        self.leaves = [TMTree("leaf" + str(i), [], 10 * (i + 1))
+                       for i in range(6)]
+        self.folderA = TMTree("folderA", self.leaves[:3], 0)
+        self.folderB = TMTree("folderB", self.leaves[3:5], 0)
+        self.folderC = TMTree("folderC", self.leaves[5:], 0)
+        self.root = TMTree("root", [self.folderA, self.folderB,
+                                    self.folderC], 0)
+        self.root.update_rectangles((0, 0, 300, 200))
+
+    def all_rects(self):
+        return [tree.rect for tree in [self.root, self.folderA, self.folderB,
+                                       self.folderC] + self.leaves]
+
+    def assert_same_as_full_layout(self):
+        act = self.all_rects()
+        self.root.update_rectangles((0, 0, 300, 200))
+        self.assertListEqual(act, self.all_rects())
+
+    def test_change_size(self):
+        self.leaves[1].change_size(0.5)
+        self.assertTrue(self.folderA._dirty and self.root._dirty)
+        self.assertFalse(self.folderB._dirty)
+        self.root.update_dirty_rectangles()
+        self.assertFalse(self.root._dirty or self.folderA._dirty)
+        self.assert_same_as_full_layout()
+
+    def test_move(self):
+        self.leaves[0].move(self.folderC)
+        self.root.update_dirty_rectangles()
+        self.assert_same_as_full_layout()
+
+    def test_clean_subtree_skipped(self):
+        self.leaves[5].change_size(0.01)
+        self.leaves[0].rect = (5, 6, 7, 8)
+        self.root.update_dirty_rectangles()
+        self.assertEqual(self.leaves[0].rect, (5, 6, 7, 8),
+                         "A subtree that did not change should not be laid out")
+
+
+class a2_test_size_propagation(unittest.TestCase):
+    def setUp(self):
+        self.leaf = TMTree("leaf", [], 50)
+        self.leaf2 = TMTree("leaf2", [], 60)
+        self.folderA = TMTree("folderA", [self.leaf, self.leaf2], 0)
+        self.leaf3 = TMTree("leaf3", [], 70)
+        self.folderB = TMTree("folderB", [self.leaf3], 0)
+        self.root = TMTree("root", [self.folderA, self.folderB], 0)
+
+    def test_change_size_updates_all_ancestors(self):
+        self.leaf.change_size(0.1)
+        self.assertEqual(self.folderA.data_size, 115)
+        self.assertEqual(self.root.data_size, 185)
+        self.assertEqual(self.root.update_data_sizes(), 185)
+
+    def test_change_size_down_to_one(self):
+        self.leaf.change_size(-0.99)
+        self.assertEqual(self.leaf.data_size, 1)
+        self.assertEqual(self.folderA.data_size, 61)
+        self.assertEqual(self.root.data_size, 131)
+
+    def test_move_updates_both_paths(self):
+        self.leaf.move(self.folderB)
+        self.assertEqual(self.folderA.data_size, 60)
+        self.assertEqual(self.folderB.data_size, 120)
+        self.assertEqual(self.root.data_size, 180)
+        self.assertEqual(self.root.update_data_sizes(), 180)
+
+    def test_move_empties_folder(self):
+        self.leaf3.move(self.folderA)
+        self.assertEqual(self.folderB.data_size, 0)
+        self.assertEqual(self.folderA.data_size, 180)
+        self.assertEqual(self.root.data_size, 180)
+
+
+class a2_test_path_prefix(unittest.TestCase):
+    def setUp(self):
+        self.tree = FileSystemTree(os.path.join('example-directory',
+                                                'workshop'))
+        subtrees = {sub._name: sub for sub in self.tree._subtrees}
+        self.prep = subtrees['prep']
+        self.activities = subtrees['activities']
+        self.reading = [sub for sub in self.prep._subtrees
+                        if sub._name == 'reading.md'][0]
+
+    def test_prefix_is_remembered(self):
+        path = os.path.join('workshop', 'prep', 'reading.md')
+        self.assertEqual(self.reading.get_path_string(), path + ' (file)')
+        self.assertEqual(self.reading._path_prefix, path)
+        self.assertIsNone(self.prep._path_prefix)
+        self.prep.get_path_string()
+        self.prep._path_prefix = 'elsewhere'
+        self.reading._path_prefix = None
+        self.assertEqual(self.reading.get_path_string(False),
+                         os.path.join('elsewhere', 'reading.md') + ' (file)')
+
+    def test_move_discards_prefix(self):
+        self.reading.get_path_string()
+        self.activities.get_path_string()
+        self.reading.move(self.activities)
+        self.assertEqual(self.reading.get_path_string(),
+                         os.path.join('workshop', 'activities', 'reading.md')
+                         + ' (file)')
+        self.assertEqual(self.activities._path_prefix,
+                         os.path.join('workshop', 'activities'))
+
+
 unittest.main(exit=False)
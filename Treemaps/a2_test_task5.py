@@ -1,5 +1,9 @@
 import unittest
+import os
+import shutil
+import tempfile
 from tm_trees import *
+from a2_test_task1 import repr_tree
 from a2_test_task2 import is_leaf, set_expanded
 def set_expanded(tree):
     if is_leaf(tree):
@@ -340,4 +344,77 @@ class a2_task5_set_collapse(unittest.TestCase):
     
 
 
+class a2_task5_lazy_file_system_tree(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join('example-directory', 'workshop')
+
+    def test_unloaded_root(self):
+        tree = FileSystemTree(self.path, lazy=True)
+        self.assertEqual(tree.data_size, 151)
+        self.assertListEqual(tree._subtrees, [])
+        self.assertEqual(tree.get_suffix(), ' (folder)')
+
+    def test_expand_loads_one_level(self):
+        tree = FileSystemTree(self.path, lazy=True)
+        tree.update_rectangles((0, 0, 200, 100))
+        tree.expand()
+        self.assertTrue(tree._expanded)
+        sizes = sorted((sub._name, sub.data_size) for sub in tree._subtrees)
+        self.assertListEqual(sizes, [('activities', 71), ('draft.pptx', 58),
+                                     ('prep', 22)])
+        for sub in tree._subtrees:
+            self.assertIs(sub._parent_tree, tree)
+            self.assertListEqual(sub._subtrees, [])
+        self.assertEqual(sum(rect[2] * rect[3] for rect, _ in
+                             tree.get_rectangles()), 200 * 100)
+
+    def test_expand_all_matches_eager(self):
+        tree = FileSystemTree(self.path, lazy=True)
+        tree.expand_all()
+        self.assertListEqual(repr_tree(tree),
+                             repr_tree(FileSystemTree(self.path)))
+
+    def test_move_into_unloaded_folder(self):
+        tree = FileSystemTree(self.path, lazy=True)
+        tree.expand()
+        leaf = [sub for sub in tree._subtrees if sub._name == 'draft.pptx'][0]
+        prep = [sub for sub in tree._subtrees if sub._name == 'prep'][0]
+        leaf.move(prep)
+        self.assertIs(prep._subtrees[-1], leaf)
+        self.assertEqual(prep.data_size, 22 + 58)
+        self.assertEqual(tree.data_size, 151)
+
+    def test_move_nowhere(self):
+        tree = FileSystemTree(self.path, lazy=True)
+        tree.expand()
+        for sub in tree._subtrees:
+            sub.move(None)
+        self.assertEqual(len(tree._subtrees), 3)
+        self.assertEqual(tree.data_size, 151)
+
+    def test_move_folder_keeps_destination_unloaded(self):
+        tree = FileSystemTree(self.path, lazy=True)
+        tree.expand()
+        activities = [sub for sub in tree._subtrees
+                      if sub._name == 'activities'][0]
+        prep = [sub for sub in tree._subtrees if sub._name == 'prep'][0]
+        activities.move(prep)
+        self.assertIs(activities._parent_tree, tree)
+        self.assertIsNotNone(prep._unloaded)
+
+    def test_expand_deleted_folder(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'workshop')
+            shutil.copytree(self.path, path)
+            tree = FileSystemTree(path, lazy=True)
+            tree.expand()
+            prep = [sub for sub in tree._subtrees if sub._name == 'prep'][0]
+            shutil.rmtree(os.path.join(path, 'prep'))
+            prep.expand()
+        self.assertListEqual(prep._subtrees, [])
+        self.assertFalse(prep._expanded)
+        self.assertEqual(prep.data_size, 0)
+        self.assertEqual(tree.data_size, 151 - 22)
+
+
 unittest.main(exit=False)
@@ -0,0 +1,22 @@
+import unittest
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+import treemap_visualiser
+
+
+class a2_test_text_display(unittest.TestCase):
+    def tearDown(self):
+        pygame.quit()
+
+    def test_text_after_restart(self):
+        for text in ['hello', 'world', 'hello']:
+            screen = treemap_visualiser._start_pygame()
+            treemap_visualiser._render_text(screen, text)
+            self.assertEqual(
+                screen.get_at((0, treemap_visualiser.TREEMAP_HEIGHT))[:3],
+                (0, 0, 0))
+            pygame.quit()
+
+
+unittest.main(exit=False)
@@ -98,6 +98,8 @@ class PaperTree(TMTree):
 
     """
 
+    __slots__ = ('_authors', '_doi')
+
     _authors: str
     _doi: str
 
@@ -148,48 +150,29 @@ def _load_papers_to_dict(by_year: bool = True) -> Dict:
 
     If <by_year>, then use years as the roots of the subtrees of the root of
     the whole tree. Otherwise, ignore years and use categories only.
+
+    Each year or category maps to a dictionary of its subcategories, in the
+    order they first appear in the file. The papers directly in a category
+    are listed under the key "leaf", placed where its first paper appears,
+    as (title, authors, doi, citations) tuples; the other columns are not
+    kept. The file is read once, one row at a time.
     """
     result_dict = {}
-    if not by_year:
-        with open(DATA_FILE) as csvfile:
-            csvfile.readline()
-            line = csv.reader(csvfile)
-            for row in line:
-                category = row[3].split(":")
-                curr_dict = result_dict
-                for subcategory in category:
-                    if subcategory not in curr_dict:
-                        curr_dict[subcategory] = {}
-                    curr_dict = curr_dict[subcategory]
-                if "leaf" not in curr_dict:
-                    curr_dict["leaf"] = []
-                curr_dict["leaf"] += [row]
-            csvfile.close()
-            return result_dict
-    else:
-        with open(DATA_FILE) as csvfile:
-            csvfile.readline()
-            line = csv.reader(csvfile)
-            for row in line:
-                year = row[2]
-                result_dict[year] = {}
-            csvfile.close()
-
-        with open(DATA_FILE) as csvfile:
-            csvfile.readline()
-            line = csv.reader(csvfile)
-            for row in line:
-                category = row[3].split(":")
-                curr_dict = result_dict[row[2]]
-                for subcategory in category:
-                    if subcategory not in curr_dict:
-                        curr_dict[subcategory] = {}
-                    curr_dict = curr_dict[subcategory]
-                if "leaf" not in curr_dict:
-                    curr_dict["leaf"] = []
-                curr_dict["leaf"] += [row]
-            csvfile.close()
-            return result_dict
+    with open(DATA_FILE) as csvfile:
+        csvfile.readline()
+        for row in csv.reader(csvfile):
+            curr_dict = result_dict
+            categories = row[3].split(":")
+            if by_year:
+                categories.insert(0, row[2])
+            for subcategory in categories:
+                if subcategory not in curr_dict:
+                    curr_dict[subcategory] = {}
+                curr_dict = curr_dict[subcategory]
+            if "leaf" not in curr_dict:
+                curr_dict["leaf"] = []
+            curr_dict["leaf"].append((row[1], row[0], row[4], int(row[5])))
+    return result_dict
 
 
 def _build_tree_from_dict(nested_dict: Dict) -> List[PaperTree]:
@@ -198,9 +181,9 @@ def _build_tree_from_dict(nested_dict: Dict) -> List[PaperTree]:
     result_list = []
     for category in nested_dict:
         if category == "leaf":
-            for leaf in nested_dict["leaf"]:
-                result_list.append(PaperTree(leaf[1], [], leaf[0], leaf[4],
-                                             int(leaf[5]), True, False))
+            for title, authors, doi, citations in nested_dict["leaf"]:
+                result_list.append(PaperTree(title, [], authors, doi,
+                                             citations, True, False))
         else:
             subcategory = _build_tree_from_dict(nested_dict[category])
             result_list.append(PaperTree(category, subcategory))
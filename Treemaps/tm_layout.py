@@ -0,0 +1,173 @@
+"""Assignment 2: Laying out treemaps in the background
+
+=== Module Description ===
+This module contains BackgroundLayout, which lays a TMTree out again on a
+background thread after it changed, so that the thread showing the tree can
+keep responding to the user while a large tree is laid out.
+
+The background thread only works out the new rectangles; it never changes
+the tree. A finished layout is applied to the tree in one go by
+BackgroundLayout.publish, called from the thread that uses the tree, so that
+thread never sees a tree that is half laid out.
+"""
+from __future__ import annotations
+from threading import Event, Lock, Thread
+from typing import Callable, List, Optional, Tuple
+from tm_trees import TMTree
+
+
+class BackgroundLayout:
+    """Layouts of a tree after it changed, worked out one at a time on a
+    background thread.
+
+    Each layout does what update_dirty_rectangles does: it only lays out
+    again the subtrees that changed since the tree was last laid out, and
+    those whose rectangle moved as a result.
+
+    Every layout started gets the next generation number. Starting a layout
+    cancels the one before it, whose result is never applied, so only the
+    layout of the latest generation can be published. The tree must not be
+    changed while a layout is running; call cancel first.
+
+    === Public Attributes ===
+    tree:
+        The tree that is laid out.
+    generation:
+        The generation number of the last layout started, or 0 if none was.
+    published:
+        The generation number of the last layout applied to tree, or 0 if
+        none was.
+
+    === Private Attributes ===
+    _on_done:
+        Called with the generation number of each layout that finishes, on
+        the background thread, or None.
+    _thread:
+        The thread running the last layout started, or None.
+    _cancelled:
+        Set to cancel the last layout started.
+    _result:
+        The generation number, layout engine and steps, as returned by
+        TMTree._relayout_steps, of the last layout that finished and has not
+        been published or cancelled, or None.
+    _lock:
+        Held while _result is read or replaced.
+    """
+
+    tree: TMTree
+    generation: int
+    published: int
+    _on_done: Optional[Callable[[int], None]]
+    _thread: Optional[Thread]
+    _cancelled: Event
+    _result: Optional[Tuple[int, str, List[tuple]]]
+    _lock: Lock
+
+    def __init__(self, tree: TMTree,
+                 on_done: Optional[Callable[[int], None]] = None) -> None:
+        """Prepare to lay out <tree> in the background.
+
+        If <on_done> is not None, it is called with the generation number of
+        each layout that finishes without being cancelled. It is called on the
+        background thread, so it should only let the thread using the tree
+        know, e.g. by posting an event, and leave publishing to it.
+        """
+        self.tree = tree
+        self.generation = 0
+        self.published = 0
+        self._on_done = on_done
+        self._thread = None
+        self._cancelled = Event()
+        self._result = None
+        self._lock = Lock()
+
+    def start(self, rect: Optional[Tuple[int, int, int, int]] = None) -> int:
+        """Cancel the layout running, if any, and start laying out the tree in
+        <rect>, or in its current rectangle if <rect> is None, with the layout
+        engine and minimum area it was last laid out with. Return the
+        generation number of the new layout.
+        """
+        self.cancel()
+        if rect is None:
+            rect = self.tree.rect
+        self.generation += 1
+        self._cancelled = Event()
+        self._thread = Thread(target=self._run,
+                              args=(self.generation, rect, self.tree._layout,
+                                    self.tree._min_area, self._cancelled),
+                              daemon=True)
+        self._thread.start()
+        return self.generation
+
+    def _run(self, generation: int, rect: Tuple[int, int, int, int],
+             layout: str, min_area: int, cancelled: Event) -> None:
+        """Work out the layout of the given <generation> and keep it for
+        publish, unless <cancelled> is set first. This runs on the background
+        thread.
+        """
+        steps = []
+        for step in self.tree._relayout_steps(rect, layout, min_area):
+            if cancelled.is_set():
+                return
+            steps.append(step)
+        with self._lock:
+            if cancelled.is_set():
+                return
+            self._result = (generation, layout, steps)
+        if self._on_done is not None:
+            self._on_done(generation)
+
+    def running(self) -> bool:
+        """Return whether a layout is being worked out.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the layout running is finished or cancelled, for at
+        most <timeout> seconds if it is not None, and return whether it is.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running()
+
+    def cancel(self) -> bool:
+        """Cancel the last layout started, so that it is never published, and
+        wait for the background thread to let go of the tree. Return whether
+        there was a layout to cancel, i.e. one that was running or finished
+        but not published.
+
+        Call this before changing the tree, and start a new layout after.
+        """
+        self._cancelled.set()
+        with self._lock:
+            pending = self._result is not None
+            self._result = None
+        if self._thread is not None:
+            pending = pending or self._thread.is_alive()
+            self._thread.join()
+            self._thread = None
+        return pending
+
+    def publish(self) -> bool:
+        """Apply the last layout started to the tree if it has finished and
+        was not published yet, and return whether it was applied.
+        """
+        with self._lock:
+            result, self._result = self._result, None
+        if result is None or result[0] != self.generation:
+            return False
+        generation, layout, steps = result
+        for tree, rect, positions in steps:
+            tree._set_layout(rect, layout, positions)
+        self.tree._discard_position_index()
+        self.published = generation
+        return True
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'threading', 'tm_trees', '__future__'
+        ]
+    })
@@ -0,0 +1,193 @@
+"""Assignment 2: Rasterizing treemaps with NumPy
+
+=== Module Description ===
+This module turns the rectangles of a laid out treemap into pixels with a few
+NumPy array operations, instead of one pygame.draw.rect call per leaf, which
+is what makes drawing hundreds of thousands of leaves slow.
+
+Every leaf gets an index, in the order TMTree.iter_rectangles yields it, and
+pixel_ids works out the index of the leaf drawn at each pixel. The colours of
+the pixels follow from that, and the indices are useful on their own to find
+the leaf at a position: a PixelMap keeps them together with the leaves, so
+that finding the leaf under the mouse is a single array read.
+
+NumPy is required by this module.
+"""
+from itertools import chain
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+import numpy
+from tm_trees import TMTree
+from tm_store import TMStore, TMView
+
+# The index pixel_ids gives to pixels that no leaf is drawn on.
+BACKGROUND = -1
+
+
+class PixelMap:
+    """The leaf drawn at each pixel of the treemap of a tree.
+
+    A PixelMap describes the rectangles the tree was last laid out with, and
+    the leaves it displayed then, so it has to be made again whenever the tree
+    is laid out again or its displayed-tree changes.
+
+    === Public Attributes ===
+    leaves:
+        The leaves of the displayed-tree, in the order iter_rectangles yields
+        them. For a tree kept in a TMStore, their node indices in the store
+        instead, so that no view is kept for each of them.
+    colours:
+        The colour of each leaf in leaves, as an array with one row of red,
+        green and blue per leaf.
+    ids:
+        The array returned by pixel_ids for the rectangles of the leaves,
+        i.e. the index in leaves of the leaf drawn at each pixel, indexed by x
+        and then y, or BACKGROUND if there is none.
+
+    === Private Attributes ===
+    _store:
+        The TMStore the tree is kept in, or None if it is a TMTree.
+    """
+
+    leaves: List[Union[TMTree, int]]
+    colours: numpy.ndarray
+    ids: numpy.ndarray
+    _store: Optional[TMStore]
+
+    def __init__(self, tree: TMTree, size: Tuple[int, int]) -> None:
+        """Map the pixels of a treemap of the given <size>, with its top-left
+        corner at the origin, to the leaves of the displayed-tree rooted at
+        <tree>, using the rectangles it was last laid out with.
+        """
+        self.leaves = []
+        if isinstance(tree, TMView):
+            self._store = tree._store
+            pairs = tree._store.iter_rectangles(self.leaves.append,
+                                                tree._index, indices=True)
+        else:
+            self._store = None
+            pairs = tree.iter_rectangles(self.leaves.append)
+        rects, self.colours = _pack_rectangles(pairs)
+        self.ids = pixel_ids(rects, size)
+
+    def leaf_at(self, pos: Tuple[int, int]) -> Optional[TMTree]:
+        """Return the leaf drawn at the pixel <pos>, or None if there is no
+        leaf there or <pos> is outside of the treemap.
+
+        Unlike TMTree.get_tree_at_position, a pixel on the edge between two
+        rectangles belongs to the leaf whose colour it is drawn in.
+        """
+        if not (0 <= pos[0] < self.ids.shape[0] and
+                0 <= pos[1] < self.ids.shape[1]):
+            return None
+        i = self.ids[pos[0], pos[1]]
+        if i == BACKGROUND:
+            return None
+        elif self._store is not None:
+            return self._store.view(self.leaves[i])
+        return self.leaves[i]
+
+    def pixel_colours(self, background: Tuple[int, int, int] = (0, 0, 0)) \
+            -> numpy.ndarray:
+        """Return the colour of each pixel of the treemap, as returned by the
+        function pixel_colours.
+        """
+        return pixel_colours(self.ids, self.colours, background)
+
+
+def leaf_rectangles(tree: TMTree,
+                    visitor: Optional[Callable[[TMTree], None]] = None) \
+        -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the rectangles of the leaves in the displayed-tree rooted at
+    <tree>, as an array with one row of x, y, width and height per leaf, and
+    their colours, as an array with one row of red, green and blue per leaf.
+
+    The leaves are in the order tree.iter_rectangles yields them, and
+    <visitor> is passed on to it.
+    """
+    return _pack_rectangles(tree.iter_rectangles(visitor))
+
+
+def _pack_rectangles(pairs: Iterator[Tuple[Tuple[int, int, int, int],
+                                           Tuple[int, int, int]]]) \
+        -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the arrays returned by leaf_rectangles for the rectangles and
+    colours in <pairs>, as yielded by iter_rectangles.
+    """
+    values = numpy.fromiter(chain.from_iterable(chain.from_iterable(pairs)),
+                            dtype=numpy.int64).reshape(-1, 7)
+    return values[:, :4], values[:, 4:].astype(numpy.uint8)
+
+
+def pixel_ids(rects: numpy.ndarray, size: Tuple[int, int]) -> numpy.ndarray:
+    """Return an array of the given <size>, indexed by x and then y, holding
+    for each pixel the index in <rects> of the rectangle drawn on it, or
+    BACKGROUND if there is none.
+
+    As with pygame.draw.rect, a rectangle covers the pixels from its x and y
+    up to but not including its x + width and y + height, clipped to <size>,
+    and where rectangles overlap the one drawn last, i.e. with the highest
+    index, wins.
+
+    The rectangles of a treemap do not overlap, so each one is added to a
+    two-dimensional difference array at its four corners and the cumulative
+    sums along both axes give every pixel its rectangle. Only if that gives
+    some rectangle fewer pixels than its area, because rectangles overlap,
+    are they painted one by one instead.
+    """
+    width, height = size
+    left = numpy.clip(rects[:, 0], 0, width)
+    top = numpy.clip(rects[:, 1], 0, height)
+    right = numpy.clip(rects[:, 0] + rects[:, 2], left, width)
+    bottom = numpy.clip(rects[:, 1] + rects[:, 3], top, height)
+
+    # Each rectangle adds its index + 1 inside itself; overlaps would add up.
+    corners = numpy.concatenate([left * (height + 1) + top,
+                                 right * (height + 1) + top,
+                                 left * (height + 1) + bottom,
+                                 right * (height + 1) + bottom])
+    ids = numpy.arange(1, len(rects) + 1)
+    weights = numpy.concatenate([ids, -ids, -ids, ids])
+    diff = numpy.bincount(corners, weights, (width + 1) * (height + 1))
+    diff = diff.reshape(width + 1, height + 1)
+    result = diff.cumsum(axis=0).cumsum(axis=1)[:width, :height]
+    result = result.astype(numpy.int32) - 1
+
+    drawn = numpy.bincount(result.ravel() + 1, minlength=len(rects) + 1)
+    if numpy.any(drawn[1:len(rects) + 1] != (right - left) * (bottom - top)):
+        return _paint_ids(left, top, right, bottom, size)
+    return result
+
+
+def pixel_colours(ids: numpy.ndarray, colours: numpy.ndarray,
+                  background: Tuple[int, int, int] = (0, 0, 0)) \
+        -> numpy.ndarray:
+    """Return the colour of each pixel, given the <ids> returned by pixel_ids
+    and the <colours> of the rectangles, as an array indexed by x, y and then
+    red, green or blue, ready for pygame.surfarray.blit_array.
+
+    Pixels where no rectangle was drawn get the <background> colour.
+    """
+    palette = numpy.concatenate([numpy.array([background], dtype=numpy.uint8),
+                                 colours])
+    return palette[ids + 1]
+
+
+def _paint_ids(left: numpy.ndarray, top: numpy.ndarray, right: numpy.ndarray,
+               bottom: numpy.ndarray, size: Tuple[int, int]) -> numpy.ndarray:
+    """Return the same array as pixel_ids for the clipped rectangles with the
+    given edges, painting them one at a time in order.
+    """
+    result = numpy.full(size, BACKGROUND, dtype=numpy.int32)
+    for i in range(len(left)):
+        result[left[i]:right[i], top[i]:bottom[i]] = i
+    return result
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'itertools', 'numpy', 'tm_trees',
+            'tm_store'
+        ]
+    })
@@ -0,0 +1,203 @@
+"""Assignment 2: Scanning file systems in the background
+
+=== Module Description ===
+This module contains FileSystemScan, which reads the folders under a path on
+a background thread and adds them to a FileSystemTree as they are read, so
+that the tree can be shown, and used, while a large folder is still being
+scanned.
+
+The background thread never touches the tree. It only reads folders and
+passes their listings on through a queue, and the listings are added to the
+tree by FileSystemScan.update, called from the thread that uses the tree.
+"""
+from __future__ import annotations
+import os
+import time
+from queue import Queue, Empty
+from threading import Event, Thread
+from typing import Dict, List, Optional, Tuple
+from tm_trees import FileSystemTree, _make_file_system_tree, _read_folders, \
+    _load_scan_cache, _save_scan_cache
+
+
+class FileSystemScan:
+    """A scan of the files and folders at a path, read on a background
+    thread and added to a FileSystemTree as it goes.
+
+    The tree starts out as the folder at the path with nothing in it. Each
+    folder is added the first time update is called after it was read: its
+    files and folders become its subtrees, and the sizes of its files are
+    added to its data_size and those of its ancestors. Every tree changed
+    this way is marked as needing a new layout, so update_dirty_rectangles
+    lays out only what changed, and once the scan is done the tree is the
+    same as FileSystemTree would have built.
+
+    === Public Attributes ===
+    tree:
+        The tree of the files and folders read so far.
+    folders_read:
+        The number of folders added to tree so far.
+    files_found:
+        The number of files added to tree so far.
+    done:
+        Whether the scan is over and everything read was added to tree.
+
+    === Private Attributes ===
+    _queue:
+        The path and listing of the folders read but not added to tree yet,
+        in the order they were read, followed by None once the scan is over.
+    _folders:
+        The trees of the folders found in tree whose listing has not been
+        added yet, by path.
+    _stopping:
+        Set to ask the background thread to stop reading.
+    _error:
+        The error the scan failed with, or None.
+    _thread:
+        The background thread, or None if there is none.
+    """
+
+    tree: FileSystemTree
+    folders_read: int
+    files_found: int
+    done: bool
+    _queue: Queue
+    _folders: Dict[str, FileSystemTree]
+    _stopping: Event
+    _error: Optional[OSError]
+    _thread: Optional[Thread]
+
+    def __init__(self, path: str, workers: int = 1,
+                 cache_file: Optional[str] = None) -> None:
+        """Start scanning the file or folder at <path> in the background.
+
+        <workers> and <cache_file> are used as in FileSystemTree. The cache
+        is only saved if the scan is not stopped early.
+
+        Precondition: <path> is a valid path for this computer.
+        """
+        self.folders_read = 0
+        self.files_found = 0
+        self._queue = Queue()
+        self._folders = {}
+        self._stopping = Event()
+        self._error = None
+        self._thread = None
+        if not os.path.isdir(path):
+            self.tree = FileSystemTree(path)
+            self.done = True
+            return
+        self.tree = _make_file_system_tree(os.path.basename(path), [])
+        self.done = False
+        self._folders[path] = self.tree
+        self._thread = Thread(target=self._scan,
+                              args=(path, workers, cache_file), daemon=True)
+        self._thread.start()
+
+    def _scan(self, path: str, workers: int,
+              cache_file: Optional[str]) -> None:
+        """Read the folders at <path> and under it, putting their listings on
+        the queue. This runs on the background thread.
+        """
+        try:
+            cache = None if cache_file is None else \
+                _load_scan_cache(cache_file)
+            _read_folders(path, workers, cache, self._report)
+            if cache is not None:
+                _save_scan_cache(cache_file, cache)
+        except _ScanStopped:
+            pass
+        except OSError as error:
+            self._error = error
+        finally:
+            self._queue.put(None)
+
+    def _report(self, folder: str,
+                listing: List[Tuple[str, bool, int]]) -> None:
+        """Pass the <listing> of the folder at path <folder> on to update, or
+        stop the scan if stop was called.
+        """
+        if self._stopping.is_set():
+            raise _ScanStopped
+        self._queue.put((folder, listing))
+
+    def update(self, time_limit: Optional[float] = None) -> bool:
+        """Add the folders read since the last call to tree, and return
+        whether tree changed.
+
+        If <time_limit> is not None, stop adding folders after about that
+        many seconds, leaving the rest for the next call.
+
+        Raise the error the scan failed with, if it failed, once everything
+        read before it has been added.
+        """
+        start = time.perf_counter()
+        changed = False
+        while not self.done:
+            if time_limit is not None and \
+                    time.perf_counter() - start >= time_limit:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                break
+            if item is None:
+                self.done = True
+                if self._error is not None:
+                    raise self._error
+            else:
+                self._add_folder(*item)
+                changed = True
+        return changed
+
+    def _add_folder(self, folder: str,
+                    listing: List[Tuple[str, bool, int]]) -> None:
+        """Add the files and folders in <listing>, the listing of the folder at
+        path <folder>, to the tree of that folder.
+        """
+        tree = self._folders.pop(folder)
+        subtrees = []
+        total = 0
+        for name, is_folder, size in listing:
+            if is_folder:
+                subtree = _make_file_system_tree(name, [])
+                self._folders[os.path.join(folder, name)] = subtree
+            else:
+                subtree = _make_file_system_tree(name, [], size)
+                total += size
+                self.files_found += 1
+            subtree._parent_tree = tree
+            subtrees.append(subtree)
+        if subtrees != []:
+            tree._subtrees = subtrees
+        tree.data_size += total
+        tree._update_ancestor_sizes(total)
+        tree._discard_position_index()
+        self.folders_read += 1
+
+    def stop(self) -> None:
+        """Stop the scan, waiting for the folders being read to be finished.
+
+        The folders already added stay in tree, and the rest of the scan is
+        dropped.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.done = True
+
+
+class _ScanStopped(Exception):
+    """Raised on the background thread of a FileSystemScan to stop reading
+    folders once stop has been called.
+    """
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'time', 'queue', 'threading',
+            'tm_trees', '__future__'
+        ]
+    })
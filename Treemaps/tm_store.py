@@ -0,0 +1,731 @@
+"""Assignment 2: Columnar storage for large treemaps
+
+=== Module Description ===
+This module contains TMStore, which holds a whole treemap tree in parallel
+arrays instead of one TMTree object per node, and TMView, which presents one
+node of a TMStore through the same interface as a TMTree.
+
+Views are only created for the nodes that client code asks about, such as the
+node under the mouse or the selected node, so a scan of millions of files
+takes a handful of arrays rather than millions of objects. Layout, size
+updates and get_rectangles run over the arrays directly. When NumPy is
+installed, slice-and-dice layout of a whole store is done a level of the tree
+at a time with array operations.
+"""
+from __future__ import annotations
+import math
+import os
+from array import array
+from random import randint
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from weakref import WeakValueDictionary
+try:
+    import numpy
+except ImportError:
+    numpy = None
+from tm_trees import TMTree, LAYOUT_ENGINES, SLICE_AND_DICE, \
+    _read_folders, _load_scan_cache, _save_scan_cache
+
+# The index used in the link arrays of a TMStore to mean "no node".
+NO_NODE = -1
+
+
+class TMStore:
+    """A tree stored column by column: node i of the tree is described by the
+    i-th entry of each of the arrays below. Node 0 is the root.
+
+    The nodes are numbered in level order when the store is built, so every
+    node comes after its parent and the subtrees of each node are numbered
+    consecutively; move may change that.
+
+    === Private Attributes ===
+    _parent:
+        The index of the parent of each node, or NO_NODE for the root.
+    _first_child:
+        The index of the first subtree of each node, or NO_NODE for a leaf.
+    _last_child:
+        The index of the last subtree of each node, or NO_NODE for a leaf.
+    _next_sibling:
+        The index of the subtree that follows each node in its parent's
+        subtrees, or NO_NODE for the last one.
+    _size:
+        The data_size of each node.
+    _x, _y, _width, _height:
+        The rectangle of each node.
+    _colour:
+        The colour of each node, packed as 0xRRGGBB.
+    _expanded:
+        1 for each node that is expanded, 0 otherwise.
+    _name:
+        The index in _names of the name of each node.
+    _names:
+        Every distinct name in the tree, once. None is the name of an empty
+        tree.
+    _name_ids:
+        The index of each name in _names.
+    _separator:
+        The string used between names in get_path_string.
+    _suffixes:
+        The suffix get_path_string adds for a leaf and for any other node.
+    _layout:
+        The name of the layout engine in tm_trees.LAYOUT_ENGINES the tree was
+        last laid out with.
+    _min_area:
+        The smallest area a node with subtrees must have for its subtrees to
+        be laid out and displayed, as in TMTree.
+    _views:
+        The views of this store that are in use, by node index, so that asking
+        for the same node twice gives the same view.
+    _in_level_order:
+        False if a node has been moved since the store was built, so the
+        nodes may no longer be numbered in level order.
+    _levels:
+        The level order of the tree used by the NumPy layout, or None if it
+        has not been worked out since the tree last changed shape. This is the
+        nodes in level order, the position in that order of each node's
+        parent, and the position where each level of the tree starts.
+
+    === Representation Invariants ===
+    - All arrays have one entry per node.
+    - The TMTree representation invariants hold for the tree the arrays
+      describe.
+    """
+
+    _parent: array
+    _first_child: array
+    _last_child: array
+    _next_sibling: array
+    _size: array
+    _x: array
+    _y: array
+    _width: array
+    _height: array
+    _colour: array
+    _expanded: bytearray
+    _name: array
+    _names: List[Optional[str]]
+    _name_ids: Dict[Optional[str], int]
+    _separator: str
+    _suffixes: Tuple[str, str]
+    _layout: str
+    _min_area: int
+    _views: WeakValueDictionary
+    _in_level_order: bool
+    _levels: Optional[Tuple[object, object, List[int]]]
+
+    def __init__(self, separator: str, leaf_suffix: str,
+                 other_suffix: str) -> None:
+        """Initialize a new TMStore with no nodes.
+
+        <separator>, <leaf_suffix> and <other_suffix> are used by
+        get_path_string, as returned by the get_separator and get_suffix
+        methods of a TMTree.
+        """
+        self._parent = array('q')
+        self._first_child = array('q')
+        self._last_child = array('q')
+        self._next_sibling = array('q')
+        self._size = array('q')
+        self._x = array('q')
+        self._y = array('q')
+        self._width = array('q')
+        self._height = array('q')
+        self._colour = array('L')
+        self._expanded = bytearray()
+        self._name = array('q')
+        self._names = []
+        self._name_ids = {}
+        self._separator = separator
+        self._suffixes = (leaf_suffix, other_suffix)
+        self._layout = SLICE_AND_DICE
+        self._min_area = 0
+        self._views = WeakValueDictionary()
+        self._in_level_order = True
+        self._levels = None
+
+    @classmethod
+    def from_tree(cls, tree: TMTree) -> TMStore:
+        """Return a new TMStore with the same nodes as <tree>, including their
+        rectangles, colours and whether they are expanded.
+        """
+        leaf_suffix = other_suffix = ''
+        store = cls('', '', '')
+        queue = [(tree, NO_NODE)]
+        for node, parent in queue:
+            colour = node._colour
+            i = store._add_node(parent, node._name, node.data_size,
+                                (colour[0] << 16) | (colour[1] << 8) |
+                                colour[2])
+            store._set_rect(i, node.rect)
+            store._expanded[i] = 1 if node._expanded else 0
+            if node.is_empty():
+                continue
+            if node._subtrees == []:
+                leaf_suffix = leaf_suffix or node.get_suffix()
+            else:
+                other_suffix = other_suffix or node.get_suffix()
+            queue.extend((subtree, i) for subtree in node._subtrees)
+        store._separator = tree.get_separator() if queue[1:] else ''
+        store._suffixes = (leaf_suffix, other_suffix)
+        return store
+
+    @classmethod
+    def from_file_system(cls, path: str, workers: int = 1,
+                         cache_file: Optional[str] = None) -> TMStore:
+        """Return a new TMStore for the files and folders at <path>, with the
+        same nodes a FileSystemTree for <path> would have.
+
+        <workers> and <cache_file> have the same meaning as for
+        FileSystemTree. No TMTree is built along the way.
+
+        Precondition: <path> is a valid path for this computer.
+        """
+        store = cls(os.sep, ' (file)', ' (folder)')
+        if not os.path.isdir(path):
+            store._add_node(NO_NODE, os.path.basename(path),
+                            os.path.getsize(path), _random_colour())
+            return store
+        cache = None if cache_file is None else _load_scan_cache(cache_file)
+        listings = _read_folders(path, workers, cache)
+        if cache is not None:
+            _save_scan_cache(cache_file, cache)
+
+        queue = [(path, store._add_node(NO_NODE, os.path.basename(path), 0,
+                                        _random_colour()))]
+        for folder, i in queue:
+            for name, is_folder, size in listings[folder][1]:
+                child = store._add_node(i, name, size, _random_colour())
+                if is_folder:
+                    queue.append((os.path.join(folder, name), child))
+        store.update_data_sizes()
+        return store
+
+    def __len__(self) -> int:
+        """Return the number of nodes in this store.
+        """
+        return len(self._parent)
+
+    def root(self) -> TMView:
+        """Return the view of the root of this store.
+        """
+        return self.view(0)
+
+    def view(self, i: int) -> TMView:
+        """Return the view of node <i>.
+
+        While a view of a node is in use, the same view is returned for it.
+        """
+        view = self._views.get(i)
+        if view is None:
+            view = TMView(self, i)
+            self._views[i] = view
+        return view
+
+    def _add_node(self, parent: int, name: Optional[str], size: int,
+                  colour: int) -> int:
+        """Add a node with the given <name>, data_size <size> and packed
+        <colour> as the last subtree of node <parent>, and return its index.
+
+        If <parent> is NO_NODE, the node has no parent.
+        """
+        i = len(self._parent)
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = len(self._names)
+            self._names.append(name)
+            self._name_ids[name] = name_id
+        for column in (self._parent, self._first_child, self._last_child,
+                       self._next_sibling):
+            column.append(NO_NODE)
+        for column in (self._x, self._y, self._width, self._height):
+            column.append(0)
+        self._size.append(size)
+        self._colour.append(colour)
+        self._expanded.append(0)
+        self._name.append(name_id)
+        if parent != NO_NODE:
+            self._link(i, parent)
+        return i
+
+    def _link(self, i: int, parent: int) -> None:
+        """Make node <i> the last subtree of node <parent>.
+        """
+        self._parent[i] = parent
+        self._next_sibling[i] = NO_NODE
+        if self._last_child[parent] == NO_NODE:
+            self._first_child[parent] = i
+        else:
+            self._next_sibling[self._last_child[parent]] = i
+        self._last_child[parent] = i
+        self._levels = None
+
+    def _unlink(self, i: int) -> None:
+        """Remove node <i> from the subtrees of its parent.
+        """
+        parent = self._parent[i]
+        previous = NO_NODE
+        child = self._first_child[parent]
+        while child != i:
+            previous = child
+            child = self._next_sibling[child]
+        if previous == NO_NODE:
+            self._first_child[parent] = self._next_sibling[i]
+        else:
+            self._next_sibling[previous] = self._next_sibling[i]
+        if self._last_child[parent] == i:
+            self._last_child[parent] = previous
+        self._parent[i] = NO_NODE
+        self._next_sibling[i] = NO_NODE
+        self._in_level_order = False
+        self._levels = None
+
+    def _children(self, i: int) -> List[int]:
+        """Return the indices of the subtrees of node <i>, in order.
+        """
+        children = []
+        child = self._first_child[i]
+        while child != NO_NODE:
+            children.append(child)
+            child = self._next_sibling[child]
+        return children
+
+    def _rect(self, i: int) -> Tuple[int, int, int, int]:
+        """Return the rectangle of node <i>.
+        """
+        return self._x[i], self._y[i], self._width[i], self._height[i]
+
+    def _set_rect(self, i: int, rect: Tuple[int, int, int, int]) -> None:
+        """Set the rectangle of node <i> to <rect>.
+        """
+        self._x[i], self._y[i], self._width[i], self._height[i] = rect
+
+    def _is_empty(self, i: int) -> bool:
+        """Return True iff node <i> is an empty tree.
+        """
+        return self._names[self._name[i]] is None
+
+    def _shows_subtrees(self, i: int) -> bool:
+        """Return True iff the subtrees of node <i> are displayed in its
+        place, i.e. it has subtrees, is expanded and is not culled.
+        """
+        return self._first_child[i] != NO_NODE and self._expanded[i] == 1 \
+            and self._width[i] * self._height[i] >= self._min_area
+
+    def update_rectangles(self, rect: Tuple[int, int, int, int],
+                          layout: Optional[str] = None,
+                          min_area: Optional[int] = None, i: int = 0) -> None:
+        """Update the rectangles of node <i> and its descendants to fill
+        <rect>, like TMTree.update_rectangles.
+        """
+        if layout is None:
+            layout = self._layout
+        elif layout not in LAYOUT_ENGINES:
+            raise ValueError('unknown layout engine: {}'.format(layout))
+        if min_area is not None:
+            self._min_area = min_area
+        self._layout = layout
+        if numpy is not None and layout == SLICE_AND_DICE and i == 0:
+            self._numpy_slice_and_dice(rect)
+            return
+        engine = LAYOUT_ENGINES[layout]
+        stack = [(i, rect)]
+        while stack:
+            node, rect = stack.pop()
+            size = self._size[node]
+            if size == 0 or self._is_empty(node):
+                self._set_rect(node, (0, 0, 0, 0))
+                continue
+            self._set_rect(node, rect)
+            children = self._children(node)
+            if children and rect[2] * rect[3] >= self._min_area:
+                positions = engine(rect, [self._size[child]
+                                          for child in children], size)
+                stack.extend(zip(children, positions))
+
+    def _level_order(self) -> Tuple[object, object, List[int]]:
+        """Return the nodes of this store in level order, with the subtrees
+        of each node in order, as a NumPy array; the position of the parent of
+        each of them in that array; and the position where each level starts,
+        followed by the number of nodes.
+
+        The positions of the parents never decrease along the order, so the
+        subtrees of a node are next to each other.
+        """
+        if self._levels is None:
+            parents = numpy.array(self._parent, dtype=numpy.int64)
+            if self._in_level_order and \
+                    numpy.all(parents[1:] >= parents[:-1]):
+                order = numpy.arange(len(self), dtype=numpy.int64)
+            else:
+                nodes = [0]
+                positions = [NO_NODE]
+                for position, node in enumerate(nodes):
+                    for child in self._children(node):
+                        nodes.append(child)
+                        positions.append(position)
+                order = numpy.array(nodes, dtype=numpy.int64)
+                parents = numpy.array(positions, dtype=numpy.int64)
+            starts = [0, 1]
+            while starts[-1] < len(order):
+                # The next level ends at the first node whose parent is not in
+                # the level before it.
+                starts.append(int(numpy.searchsorted(parents, starts[-1])))
+            self._levels = (order, parents, starts)
+        return self._levels
+
+    def _numpy_slice_and_dice(self, rect: Tuple[int, int, int, int]) -> None:
+        """Lay out the whole tree in <rect> with the slice-and-dice engine,
+        one level at a time, using NumPy.
+
+        This gives exactly the rectangles tm_trees._slice_and_dice gives:
+        each subtree's length is its share of its parent's longer side rounded
+        down, and the last subtree takes what is left. As in update_rectangles,
+        nodes of size 0 get an empty rectangle and the descendants of those and
+        of culled nodes are left as they were.
+        """
+        order, parents, starts = self._level_order()
+        sizes = numpy.frombuffer(self._size, dtype=numpy.int64)
+        columns = [numpy.frombuffer(column, dtype=numpy.int64)
+                   for column in (self._x, self._y, self._width,
+                                  self._height)]
+        if sizes[0] == 0 or self._is_empty(0):
+            rect = (0, 0, 0, 0)
+        for column, value in zip(columns, rect):
+            column[0] = value
+        # The rectangles of the nodes in the current level, and which of them
+        # were laid out with a size other than 0.
+        x, y, width, height = (numpy.array([value], dtype=numpy.int64)
+                               for value in rect)
+        open_nodes = numpy.array([sizes[0] != 0 and not self._is_empty(0) and
+                                  rect[2] * rect[3] >= self._min_area])
+        level_sizes = sizes[order[:1]]
+        for level in range(1, len(starts) - 1):
+            start, end = starts[level], starts[level + 1]
+            nodes = order[start:end]
+            parent = parents[start:end] - starts[level - 1]
+            active = open_nodes[parent]
+            along = width[parent] > height[parent]
+            span = numpy.where(along, width[parent], height[parent])
+            child_sizes = sizes[nodes]
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                lengths = child_sizes / level_sizes[parent] * span
+            lengths = numpy.where(active, lengths, 0).astype(numpy.int64)
+
+            # The offset of each subtree from the start of its parent is the
+            # sum of the lengths before it among its parent's subtrees.
+            first = numpy.ones(len(nodes), dtype=bool)
+            first[1:] = parent[1:] != parent[:-1]
+            last = numpy.ones(len(nodes), dtype=bool)
+            last[:-1] = first[1:]
+            before = numpy.cumsum(lengths) - lengths
+            group_start = numpy.maximum.accumulate(
+                numpy.where(first, numpy.arange(len(nodes)), 0))
+            offsets = before - before[group_start]
+            lengths = numpy.where(last, span - offsets, lengths)
+
+            empty = child_sizes == 0
+            x = numpy.where(empty, 0,
+                            x[parent] + numpy.where(along, offsets, 0))
+            y = numpy.where(empty, 0,
+                            y[parent] + numpy.where(along, 0, offsets))
+            width = numpy.where(empty, 0,
+                                numpy.where(along, lengths, width[parent]))
+            height = numpy.where(empty, 0,
+                                 numpy.where(along, height[parent], lengths))
+            for column, values in zip(columns, (x, y, width, height)):
+                column[nodes[active]] = values[active]
+            open_nodes = active & ~empty & (width * height >= self._min_area)
+            level_sizes = child_sizes
+
+    def update_data_sizes(self, i: int = 0) -> int:
+        """Update the data_size of node <i> and its descendants from the sizes
+        of their leaves, and return the new size of node <i>.
+        """
+        nodes = [i]
+        for node in nodes:
+            nodes.extend(self._children(node))
+        for node in reversed(nodes):
+            if self._first_child[node] != NO_NODE:
+                self._size[node] = sum(self._size[child]
+                                       for child in self._children(node))
+        return self._size[i]
+
+    def get_rectangles(self, i: int = 0) \
+            -> List[Tuple[Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Return the rectangle and colour of every leaf in the displayed-tree
+        rooted at node <i>, like TMTree.get_rectangles.
+        """
+        return list(self.iter_rectangles(None, i))
+
+    def iter_rectangles(self, visitor: Optional[Callable[[TMView], None]] =
+                        None, i: int = 0, indices: bool = False) \
+            -> Iterator[Tuple[Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Yield the same tuples as get_rectangles, one at a time, like
+        TMTree.iter_rectangles.
+
+        Views are only created for the leaves when there is a <visitor>, and
+        not even then if <indices> is True: <visitor> is called with the index
+        of each leaf instead.
+        """
+        stack = [i]
+        while stack:
+            node = stack.pop()
+            if self._size[node] == 0 or self._is_empty(node):
+                continue
+            if not self._shows_subtrees(node):
+                if visitor is not None:
+                    visitor(node if indices else self.view(node))
+                colour = self._colour[node]
+                yield self._rect(node), (colour >> 16, (colour >> 8) & 0xFF,
+                                         colour & 0xFF)
+            else:
+                stack.extend(reversed(self._children(node)))
+
+    def get_tree_at_position(self, pos: Tuple[int, int],
+                             i: int = 0) -> Optional[TMView]:
+        """Return the view of the leaf in the displayed-tree rooted at node <i>
+        whose rectangle contains <pos>, like TMTree.get_tree_at_position.
+        """
+        if self._is_empty(i) or not _contains(self._rect(i), pos):
+            return None
+        node = i
+        while self._shows_subtrees(node):
+            child = self._first_child[node]
+            while child != NO_NODE and not _contains(self._rect(child), pos):
+                child = self._next_sibling[child]
+            if child == NO_NODE:
+                return None
+            node = child
+        return self.view(node)
+
+    def _update_ancestor_sizes(self, i: int, delta: int) -> None:
+        """Add <delta> to the data_size of every ancestor of node <i>.
+        """
+        parent = self._parent[i]
+        while parent != NO_NODE:
+            self._size[parent] += delta
+            parent = self._parent[parent]
+
+    def _collapse(self, i: int) -> None:
+        """Collapse node <i> and its descendants, and its parent, like
+        TMTree.collapse.
+        """
+        nodes = [i]
+        for node in nodes:
+            self._expanded[node] = 0
+            nodes.extend(self._children(node))
+        if self._parent[i] != NO_NODE:
+            self._expanded[self._parent[i]] = 0
+
+    def get_path_string(self, i: int, final_node: bool = True) -> str:
+        """Return the path from the root to node <i>, like
+        TMTree.get_path_string.
+        """
+        names = []
+        node = i
+        while node != NO_NODE:
+            names.append(self._names[self._name[node]])
+            node = self._parent[node]
+        path = self._separator.join(reversed(names))
+        is_leaf = self._first_child[i] == NO_NODE
+        if final_node or (self._parent[i] != NO_NODE and is_leaf):
+            path += self._suffixes[0] if is_leaf else self._suffixes[1]
+        return path
+
+
+class TMView:
+    """One node of a TMStore, presented with the interface of a TMTree.
+
+    Views hold no data of their own; every attribute is read from and written
+    to the store.
+
+    === Private Attributes ===
+    _store:
+        The store this node is in.
+    _index:
+        The index of this node in _store.
+    """
+
+    __slots__ = ('_store', '_index', '__weakref__')
+
+    _store: TMStore
+    _index: int
+
+    def __init__(self, store: TMStore, index: int) -> None:
+        """Initialize a view of node <index> of <store>.
+
+        Use TMStore.view rather than calling this directly, so that each node
+        has one view.
+        """
+        self._store = store
+        self._index = index
+
+    @property
+    def rect(self) -> Tuple[int, int, int, int]:
+        """The rectangle of this node."""
+        return self._store._rect(self._index)
+
+    @property
+    def data_size(self) -> int:
+        """The data_size of this node."""
+        return self._store._size[self._index]
+
+    def is_empty(self) -> bool:
+        """Return True iff this tree is empty.
+        """
+        return self._store._is_empty(self._index)
+
+    def update_rectangles(self, rect: Tuple[int, int, int, int],
+                          layout: Optional[str] = None,
+                          min_area: Optional[int] = None) -> None:
+        """Update the rectangles in this tree and its descendants to fill
+        <rect>; see TMTree.update_rectangles.
+        """
+        self._store.update_rectangles(rect, layout, min_area, self._index)
+
+    def update_dirty_rectangles(self, rect: Optional[Tuple[int, int, int, int]]
+                                = None) -> None:
+        """Update the rectangles in this tree and its descendants, keeping
+        this tree's rectangle unless another <rect> is given.
+
+        The arrays do not track which nodes changed, so this lays out the
+        whole tree again, without building any objects.
+        """
+        if rect is None:
+            rect = self.rect
+        self._store.update_rectangles(rect, None, None, self._index)
+
+    def get_rectangles(self) -> List[Tuple[Tuple[int, int, int, int],
+                                           Tuple[int, int, int]]]:
+        """Return the rectangle and colour of every leaf in the displayed-tree
+        rooted at this tree; see TMTree.get_rectangles.
+        """
+        return self._store.get_rectangles(self._index)
+
+    def iter_rectangles(self, visitor: Optional[Callable[[TMView], None]] =
+                        None) -> Iterator[Tuple[Tuple[int, int, int, int],
+                                                Tuple[int, int, int]]]:
+        """Yield the same tuples as get_rectangles, one at a time; see
+        TMTree.iter_rectangles.
+        """
+        return self._store.iter_rectangles(visitor, self._index)
+
+    def get_tree_at_position(self, pos: Tuple[int, int]) -> Optional[TMView]:
+        """Return the leaf in the displayed-tree rooted at this tree whose
+        rectangle contains <pos>; see TMTree.get_tree_at_position.
+        """
+        return self._store.get_tree_at_position(pos, self._index)
+
+    def update_data_sizes(self) -> int:
+        """Update the data_size for this tree and its subtrees, and return the
+        new size; see TMTree.update_data_sizes.
+        """
+        return self._store.update_data_sizes(self._index)
+
+    def move(self, destination: TMView) -> None:
+        """If this tree is a leaf, and <destination> is not a leaf, move this
+        tree to be the last subtree of <destination>; see TMTree.move. Do
+        nothing if <destination> is None.
+        """
+        if destination is None:
+            return
+        store, i, dest = self._store, self._index, destination._index
+        if store._first_child[i] != NO_NODE or store._expanded[i] or \
+                store._first_child[dest] == NO_NODE:
+            return
+        parent = store._parent[i]
+        store._update_ancestor_sizes(i, -store._size[i])
+        if parent != NO_NODE:
+            store._unlink(i)
+            if store._first_child[parent] == NO_NODE:
+                store._expanded[parent] = 0
+                store._size[parent] = 0
+        store._link(i, dest)
+        store._update_ancestor_sizes(i, store._size[i])
+
+    def change_size(self, factor: float) -> None:
+        """Change the data_size of this leaf by <factor>, rounding the change
+        up, and update its ancestors; see TMTree.change_size.
+        """
+        store, i = self._store, self._index
+        old_size = store._size[i]
+        if store._first_child[i] == NO_NODE and old_size > 1:
+            change = math.ceil(old_size * abs(factor))
+            if factor > 0:
+                store._size[i] = old_size + change
+            else:
+                store._size[i] = max(old_size - change, 1)
+            store._update_ancestor_sizes(i, store._size[i] - old_size)
+
+    def expand(self) -> None:
+        """Expand this tree if it is not a leaf.
+        """
+        if self._store._first_child[self._index] != NO_NODE:
+            self._store._expanded[self._index] = 1
+
+    def expand_all(self) -> None:
+        """Expand this tree and all of its descendants that are not leaves.
+        """
+        store = self._store
+        nodes = [self._index]
+        for node in nodes:
+            if store._first_child[node] != NO_NODE:
+                store._expanded[node] = 1
+                nodes.extend(store._children(node))
+
+    def collapse(self) -> None:
+        """Collapse this tree, its descendants and its parent.
+        """
+        self._store._collapse(self._index)
+
+    def collapse_all(self) -> None:
+        """Collapse the whole tree this node is in, unless it is the root.
+        """
+        store = self._store
+        parent = store._parent[self._index]
+        while parent != NO_NODE:
+            store._collapse(parent)
+            parent = store._parent[parent]
+
+    def get_path_string(self, final_node: bool = True) -> str:
+        """Return a string representing the path containing this tree and its
+        ancestors; see TMTree.get_path_string.
+        """
+        return self._store.get_path_string(self._index, final_node)
+
+    def get_separator(self) -> str:
+        """Return the string used to separate names in the string
+        representation of a path from the tree root to this tree.
+        """
+        return self._store._separator
+
+    def get_suffix(self) -> str:
+        """Return the string used at the end of the string representation of
+        a path from the tree root to this tree.
+        """
+        is_leaf = self._store._first_child[self._index] == NO_NODE
+        return self._store._suffixes[0 if is_leaf else 1]
+
+
+def _contains(rect: Tuple[int, int, int, int], pos: Tuple[int, int]) -> bool:
+    """Return True iff <pos> is in <rect>, including its edges.
+    """
+    return rect[0] <= pos[0] <= rect[0] + rect[2] and \
+        rect[1] <= pos[1] <= rect[1] + rect[3]
+
+
+def _random_colour() -> int:
+    """Return a random colour, packed as 0xRRGGBB.
+    """
+    return (randint(0, 255) << 16) | (randint(0, 255) << 8) | randint(0, 255)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'random', 'os', 'array', 'weakref',
+            'numpy',
+            'tm_trees', '__future__'
+        ]
+    })
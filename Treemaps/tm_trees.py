@@ -18,9 +18,45 @@ computer's file system.
 """
 from __future__ import annotations
 import os
+import json
 import math
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from random import randint
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
+
+# Names of the layout engines that ship with this module. See LAYOUT_ENGINES.
+SLICE_AND_DICE = 'slice-and-dice'
+SQUARIFIED = 'squarified'
+
+# The most cells of the position index each rectangle in it is listed in, on
+# average, before the index gives up on its grid. See _PositionIndex.
+MAX_CELL_ENTRIES_PER_TREE = 16
+
+# The number of lookups get_tree_at_position answers by walking the tree after
+# it was laid out before it builds a position index. Building the index takes
+# about as long as this many walks, so hovering over a tree that keeps
+# changing never costs much more than walking it would.
+LOOKUPS_BEFORE_INDEX = 64
+
+
+class _NoSubtrees(list):
+    """The empty list of subtrees shared by every leaf, so that leaves do not
+    each need a list of their own.
+
+    It cannot be changed; a tree that gains subtrees gets a new list.
+    """
+
+    def _refuse(self, *args: object, **kwargs: object) -> None:
+        """Raise an error, since this list cannot be changed.
+        """
+        raise TypeError('the subtrees of a leaf cannot be changed in place')
+
+    append = extend = insert = remove = pop = clear = _refuse
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _refuse
+
+
+_NO_SUBTREES = _NoSubtrees()
 
 
 class TMTree:
@@ -29,12 +65,10 @@ class TMTree:
 
     This is an abstract class that should not be instantiated directly.
 
-    You may NOT add any attributes, public or private, to this class.
-    However, part of this assignment will involve you implementing new public
-    *methods* for this interface.
-    You should not add any new public methods other than those required by
-    the client code.
-    You can, however, freely add private methods as needed.
+    Trees can have millions of nodes, so the attributes are stored in
+    __slots__ rather than in a dict per node, and all leaves share one empty
+    list of subtrees. Subclasses must declare __slots__ for their own
+    attributes as well.
 
     === Public Attributes ===
     rect:
@@ -55,6 +89,25 @@ class TMTree:
         as a subtree, or None if this tree is not part of a larger tree.
     _expanded:
         Whether or not this tree is considered expanded for visualization.
+    _state:
+        If this tree is the root of its whole tree, the layout settings and
+        the position index of the whole tree, or None if it has not needed
+        them yet. None for every other tree, so that nodes do not each carry
+        state that only the root uses. The _layout and _min_area properties
+        look the settings up through the root.
+    _dirty:
+        Whether the data_size of this tree or of one of its descendants, or
+        the subtrees of one of them, changed through change_size or move since
+        this tree was last laid out.
+    _offsets:
+        If the subtrees of this tree were last placed by slice-and-dice, the
+        x or y coordinate, along the longer side of rect, at which each
+        subtree starts, in order. Otherwise, None.
+    _path_prefix:
+        The names of the root of this tree's whole tree and of its descendants
+        down to this tree, each preceded by its separator except the root's,
+        or None if it has not been needed since this tree was created or
+        moved. get_path_string adds the suffix to it.
 
     === Representation Invariants ===
     - data_size >= 0
@@ -73,8 +126,14 @@ class TMTree:
     - if _expanded is False, then _expanded is False for every tree
       in _subtrees
     - if _subtrees is empty, then _expanded is False
+    - if _parent_tree is not None, then _state is None
+    - if _dirty is True, then _parent_tree._dirty is True
     """
 
+    __slots__ = ('rect', 'data_size', '_colour', '_name', '_subtrees',
+                 '_parent_tree', '_expanded', '_state', '_dirty', '_offsets',
+                 '_path_prefix')
+
     rect: Tuple[int, int, int, int]
     data_size: int
     _colour: Tuple[int, int, int]
@@ -82,6 +141,10 @@ class TMTree:
     _subtrees: List[TMTree]
     _parent_tree: Optional[TMTree]
     _expanded: bool
+    _state: Optional[_LayoutState]
+    _dirty: bool
+    _offsets: Optional[List[int]]
+    _path_prefix: Optional[str]
 
     def __init__(self, name: str, subtrees: List[TMTree],
                  data_size: int = 0) -> None:
@@ -99,7 +162,7 @@ class TMTree:
         """
         self.rect = (0, 0, 0, 0)
         self._name = name
-        self._subtrees = subtrees[:]
+        self._subtrees = subtrees[:] if subtrees else _NO_SUBTREES
         self._parent_tree = None
 
         # You will change this in Task 5
@@ -108,6 +171,10 @@ class TMTree:
         # else:
         #     self._expanded = False
         self._expanded = False
+        self._state = None
+        self._dirty = False
+        self._offsets = None
+        self._path_prefix = None
 
         # 1. Initialize self._colour and self.data_size, according to the
         # docstring.
@@ -125,56 +192,175 @@ class TMTree:
             self.data_size = total_size
             for subtree in self._subtrees:
                 subtree._parent_tree = self
+                subtree._state = None
 
     def is_empty(self) -> bool:
         """Return True iff this tree is empty.
         """
         return self._name is None
 
-    def update_rectangles(self, rect: Tuple[int, int, int, int]) -> None:
+    @property
+    def _layout(self) -> str:
+        """The name of the layout engine in LAYOUT_ENGINES used to place the
+        subtrees of the trees in this tree's whole tree. update_rectangles
+        records the engine it used, so a tree keeps its layout until a
+        different one is requested.
+        """
+        return self._root_state().layout
+
+    @property
+    def _min_area(self) -> int:
+        """The smallest area, in pixels, a tree with subtrees in this tree's
+        whole tree must have for update_rectangles to lay out its subtrees. A
+        smaller tree with subtrees is culled: its subtrees are not laid out,
+        and it is drawn and found by get_tree_at_position as if it were a
+        leaf, even if it is expanded.
+        """
+        return self._root_state().min_area
+
+    def _root_state(self) -> _LayoutState:
+        """Return the layout state of the root of this tree's whole tree,
+        giving it one if it has none yet.
+        """
+        tree = self
+        while tree._parent_tree is not None:
+            tree = tree._parent_tree
+        if tree._state is None:
+            tree._state = _LayoutState()
+        return tree._state
+
+    def update_rectangles(self, rect: Tuple[int, int, int, int],
+                          layout: Optional[str] = None,
+                          min_area: Optional[int] = None) -> None:
         """Update the rectangles in this tree and its descendants using the
         treemap algorithm to fill the area defined by pygame rectangle <rect>.
+
+        <layout> names the engine in LAYOUT_ENGINES used to place subtrees. If
+        it is None, the engine this tree was last laid out with is used, which
+        is slice-and-dice unless another one was requested before.
+
+        Trees with subtrees whose rectangle has an area smaller than
+        <min_area> are culled: their subtrees are not laid out, and they are
+        shown as one rectangle. If <min_area> is None, the minimum area this
+        tree was last laid out with is used, which is 0 unless another one was
+        requested before.
+
+        The engine and minimum area are recorded for this tree's whole tree,
+        even if this tree is not its root.
         """
+        state = self._root_state()
+        if layout is None:
+            layout = state.layout
+        elif layout not in LAYOUT_ENGINES:
+            raise ValueError('unknown layout engine: {}'.format(layout))
+        if min_area is None:
+            min_area = state.min_area
+        state.layout = layout
+        state.min_area = min_area
+        self._layout_subtrees(rect, layout, min_area)
+        self._discard_position_index()
 
-        # Read the handout carefully to help get started identifying base cases,
-        # then write the outline of a recursive step.
-        #
-        # Programming tip: use "tuple unpacking assignment" to easily extract
-        # elements of a rectangle, as follows.
-        # x, y, width, height = rect
-        if self.is_empty() or self.data_size == 0:
-            self.rect = (0, 0, 0, 0)
-        elif self._subtrees == []:
-            self.rect = rect
-        else:
-            if rect[2] > rect[3]:
-                upper_left = rect[0]
-                width_sum = 0
-                for i in range(len(self._subtrees) - 1):
-                    proportion = self._subtrees[i].data_size / self.data_size
-                    position = (upper_left, rect[1], int(proportion * rect[2]),
-                                rect[3])
-                    self._subtrees[i].update_rectangles(position)
-                    upper_left = upper_left + int(proportion * rect[2])
-                    width_sum += int(proportion * rect[2])
-                final_position = (upper_left, rect[1], (rect[2] - width_sum),
-                                  rect[3])
-                self._subtrees[-1].update_rectangles(final_position)
-                self.rect = rect
+    def _layout_subtrees(self, rect: Tuple[int, int, int, int],
+                         layout: str, min_area: int) -> None:
+        """Set this tree's rectangle to <rect> and place its descendants
+        inside it using the layout engine named <layout>, culling trees
+        smaller than <min_area>.
+        """
+        stack = [(self, rect)]
+        while stack:
+            tree, rect = stack.pop()
+            if tree.is_empty() or tree.data_size == 0:
+                tree._set_layout((0, 0, 0, 0), layout, None)
+            elif tree._subtrees != [] and rect[2] * rect[3] >= min_area:
+                positions = tree._subtree_rects(rect, layout)
+                tree._set_layout(rect, layout, positions)
+                stack.extend(zip(tree._subtrees, positions))
+            else:
+                tree._set_layout(rect, layout, None)
+
+    def _subtree_rects(self, rect: Tuple[int, int, int, int],
+                       layout: str) -> List[Tuple[int, int, int, int]]:
+        """Return the rectangles the layout engine named <layout> gives the
+        subtrees of this tree within <rect>.
+        """
+        sizes = [subtree.data_size for subtree in self._subtrees]
+        return LAYOUT_ENGINES[layout](rect, sizes, self.data_size)
+
+    def _set_layout(self, rect: Tuple[int, int, int, int], layout: str,
+                    positions: Optional[List[Tuple[int, int, int, int]]]) \
+            -> None:
+        """Record that this tree was laid out in <rect> using the engine named
+        <layout>, with its subtrees placed at <positions>, or not placed if
+        <positions> is None, in which case the offsets of the subtrees are
+        kept.
+        """
+        self.rect = rect
+        self._dirty = False
+        if positions is not None:
+            if layout == SLICE_AND_DICE:
+                axis = 0 if rect[2] > rect[3] else 1
+                self._offsets = [position[axis] for position in positions]
+            else:
+                self._offsets = None
+
+    def update_dirty_rectangles(self, rect: Optional[Tuple[int, int, int, int]]
+                                = None) -> None:
+        """Update the rectangles in this tree and its descendants after
+        change_size or move, keeping this tree's current layout, and its
+        current rectangle unless another <rect> is given.
+
+        Only the subtrees that changed since the last layout, and those whose
+        rectangle moved as a result, are laid out again. This gives the same
+        rectangles as update_rectangles as long as data_size was only changed
+        through change_size and move.
+
+        A tree of size 0 has no rectangle, so <rect> must be given to lay out
+        a tree that has just grown from size 0.
+        """
+        if rect is None:
+            rect = self.rect
+        state = self._root_state()
+        self._relayout_dirty(rect, state.layout, state.min_area)
+        self._discard_position_index()
+
+    def _relayout_dirty(self, rect: Tuple[int, int, int, int],
+                        layout: str, min_area: int) -> None:
+        """Lay out this tree in <rect> using the engine named <layout> and
+        culling trees smaller than <min_area>, unless it is not dirty and
+        already occupies <rect>.
+        """
+        for tree, rect, positions in self._relayout_steps(rect, layout,
+                                                          min_area):
+            tree._set_layout(rect, layout, positions)
+
+    def _relayout_steps(self, rect: Tuple[int, int, int, int], layout: str,
+                        min_area: int) \
+            -> Iterator[Tuple[TMTree, Tuple[int, int, int, int],
+                              Optional[List[Tuple[int, int, int, int]]]]]:
+        """Yield each tree that _relayout_dirty lays out again, with its new
+        rectangle and the rectangles of its subtrees, or None if its subtrees
+        are not placed.
+
+        A tree that is not dirty and already occupies its new rectangle is
+        skipped, along with its descendants.
+
+        No tree is changed, so the steps can be worked out on another thread
+        and applied later with _set_layout, as long as the tree does not
+        change in between.
+        """
+        stack = [(self, rect)]
+        while stack:
+            tree, rect = stack.pop()
+            if not tree._dirty and rect == tree.rect:
+                continue
+            if tree.is_empty() or tree.data_size == 0:
+                yield tree, (0, 0, 0, 0), None
+            elif tree._subtrees != [] and rect[2] * rect[3] >= min_area:
+                positions = tree._subtree_rects(rect, layout)
+                yield tree, rect, positions
+                stack.extend(zip(tree._subtrees, positions))
             else:
-                upper_left = rect[1]
-                height_sum = 0
-                for i in range(len(self._subtrees) - 1):
-                    proportion = self._subtrees[i].data_size / self.data_size
-                    position = (rect[0], upper_left, rect[2], int(proportion *
-                                                                  rect[3]))
-                    self._subtrees[i].update_rectangles(position)
-                    upper_left = upper_left + int(proportion * rect[3])
-                    height_sum += int(proportion * rect[3])
-                final_position = (rect[0], upper_left, rect[2], (rect[3] -
-                                                                 height_sum))
-                self._subtrees[-1].update_rectangles(final_position)
-                self.rect = rect
+                yield tree, rect, None
 
     def get_rectangles(self) -> List[Tuple[Tuple[int, int, int, int],
                                            Tuple[int, int, int]]]:
@@ -183,15 +369,29 @@ class TMTree:
         appropriate pygame rectangle to display for a leaf, and the colour
         to fill it with.
         """
-        if self.is_empty() or self.data_size == 0:
-            return []
-        if (self._subtrees == []) or (self._expanded is False):
-            return [(self.rect, self._colour)]
-        else:
-            result = []
-            for item in self._subtrees:
-                result.extend(item.get_rectangles())
-            return result
+        return list(self.iter_rectangles())
+
+    def iter_rectangles(self, visitor: Optional[Callable[[TMTree], None]] =
+                        None) -> Iterator[Tuple[Tuple[int, int, int, int],
+                                                Tuple[int, int, int]]]:
+        """Yield the same tuples as get_rectangles, in the same order, one at
+        a time instead of building a list of them.
+
+        If <visitor> is not None, it is called with each leaf of the
+        displayed-tree just before that leaf's tuple is yielded.
+        """
+        min_area = self._min_area
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree.is_empty() or tree.data_size == 0:
+                continue
+            if not tree._shows_subtrees(min_area):
+                if visitor is not None:
+                    visitor(tree)
+                yield tree.rect, tree._colour
+            else:
+                stack.extend(reversed(tree._subtrees))
 
     def get_tree_at_position(self, pos: Tuple[int, int]) -> Optional[TMTree]:
         """Return the leaf in the displayed-tree rooted at this tree whose
@@ -200,6 +400,10 @@ class TMTree:
 
         If <pos> is on the shared edge between two rectangles, return the
         tree represented by the rectangle that is closer to the origin.
+
+        Once the root of a whole tree has answered LOOKUPS_BEFORE_INDEX
+        lookups since it was last laid out, it builds a position index to
+        answer the next ones.
         """
         if self.is_empty():
             return None
@@ -208,49 +412,137 @@ class TMTree:
                 return None
             if pos[1] < self.rect[1] or pos[1] > (self.rect[1] + self.rect[3]):
                 return None
-            else:
+            elif self._parent_tree is not None or self._offsets is not None:
+                # Slice-and-dice subtrees are found faster by the walk
                 return self.get_tree_at_position_he(pos)
+            state = self._root_state()
+            if state.position_index is None:
+                state.lookups += 1
+                if state.lookups < LOOKUPS_BEFORE_INDEX:
+                    return self.get_tree_at_position_he(pos)
+                state.position_index = _PositionIndex(self)
+            leaf = state.position_index.lookup(pos)
+            if leaf is not None and not leaf._is_displayed_leaf():
+                # The index is out of date, because a tree was collapsed
+                # since it was built.
+                state.position_index = None
+                state.lookups = 0
+            elif leaf is not None:
+                return leaf
+            # Either the index is out of date, or <pos> is only on rectangles
+            # it leaves out, such as ones with no area; walk the tree instead.
+            return self.get_tree_at_position_he(pos)
+
+    def _shows_subtrees(self, min_area: Optional[int] = None) -> bool:
+        """Return True iff the subtrees of this tree are displayed in its
+        place, i.e. it has subtrees, is expanded and is not culled.
+
+        <min_area> is the minimum area of this tree's whole tree, which is
+        looked up through its root if it is None.
+        """
+        if self._subtrees == [] or not self._expanded:
+            return False
+        if min_area is None:
+            min_area = self._min_area
+        return self.rect[2] * self.rect[3] >= min_area
+
+    def _is_displayed_leaf(self) -> bool:
+        """Return True iff this tree is a leaf in the displayed-tree of its
+        root, i.e. it does not show its subtrees and all its ancestors do.
+        """
+        min_area = self._min_area
+        if self._shows_subtrees(min_area):
+            return False
+        parent = self._parent_tree
+        while parent is not None:
+            if not parent._shows_subtrees(min_area):
+                return False
+            parent = parent._parent_tree
+        return True
+
+    def _discard_position_index(self) -> None:
+        """Discard the position index of the root of this tree, so that it is
+        built again with the current rectangles.
+        """
+        tree = self
+        while tree._parent_tree is not None:
+            tree = tree._parent_tree
+        if tree._state is not None:
+            tree._state.position_index = None
+            tree._state.lookups = 0
 
     def get_tree_at_position_he(self, pos: Tuple[int, int]) -> Optional[TMTree]:
         """Return the leaf in the displayed-tree rooted at this tree whose
         rectangle contains position <pos>
         """
-        if (self._subtrees == []) or (self._expanded is False):
-            return self
-        else:
-            for item in self._subtrees:
+        min_area = self._min_area
+        tree = self
+        while tree._shows_subtrees(min_area):
+            found = None
+            if tree._offsets is not None and \
+                    len(tree._offsets) == len(tree._subtrees):
+                # The subtrees are in order along one axis, so the last one
+                # starting before <pos> is the only one that can contain it;
+                # one starting exactly at <pos> shares an edge with it.
+                axis = 0 if tree.rect[2] > tree.rect[3] else 1
+                item = tree._subtrees[
+                    max(bisect_left(tree._offsets, pos[axis]) - 1, 0)]
                 if (item.rect[0] <= pos[0] <= (item.rect[0] + item.rect[2])) \
                         and (item.rect[1] <= pos[1] <= (item.rect[1] +
                                                         item.rect[3])):
-                    return item.get_tree_at_position_he(pos)
-            return None
+                    found = item
+            if found is None:
+                for item in tree._subtrees:
+                    if (item.rect[0] <= pos[0] <=
+                            (item.rect[0] + item.rect[2])) \
+                            and (item.rect[1] <= pos[1] <=
+                                 (item.rect[1] + item.rect[3])):
+                        found = item
+                        break
+            if found is None:
+                return None
+            tree = found
+        return tree
 
     def update_data_sizes(self) -> int:
         """Update the data_size for this tree and its subtrees, based on the
         size of their leaves, and return the new size.
 
         If this tree is a leaf, return its size unchanged.
+
+        change_size and move keep data_size up to date on their own, so this
+        is only needed after data_size was changed directly, or to check that
+        the sizes are consistent.
         """
-        if self.is_empty():
-            pass
-        if self._subtrees == []:
-            return self.data_size
-        else:
-            total_size = 0
-            for item in self._subtrees:
-                total_size += item.update_data_sizes()
-            self.data_size = total_size
-            return total_size
+        trees = [self]
+        for tree in trees:
+            trees.extend(tree._subtrees)
+        # Every tree comes after its parent in <trees>, so going backwards
+        # each subtree's size is updated before its parent's.
+        for tree in reversed(trees):
+            if tree._subtrees != []:
+                tree.data_size = sum(item.data_size
+                                     for item in tree._subtrees)
+        return self.data_size
 
     def move(self, destination: TMTree) -> None:
         """If this tree is a leaf, and <destination> is not a leaf, move this
         tree to be the last subtree of <destination>. Otherwise, do nothing.
+        Also do nothing if <destination> is None.
+
+        The data_size of the old and new ancestors of this tree is updated.
         """
         if self.is_empty():
             pass
-        if (self._subtrees == [] and self._expanded is False) and \
-                destination._subtrees != []:
+        if destination is None:
+            return
+        self._load_subtrees()
+        if self._subtrees != [] or self._expanded:
+            return
+        destination._load_subtrees()
+        if destination._subtrees != []:
             parent = self._parent_tree
+            self._update_ancestor_sizes(-self.data_size)
             destination._subtrees.append(self)
             if self._parent_tree is not None:
                 self._parent_tree._subtrees.remove(self)
@@ -258,6 +550,9 @@ class TMTree:
                     parent._expanded = False
                     parent.data_size = 0
             self._parent_tree = destination
+            self._discard_path_prefixes()
+            self._update_ancestor_sizes(self.data_size)
+            self._discard_position_index()
 
     def change_size(self, factor: float) -> None:
         """Change the value of this tree's data_size attribute by <factor>.
@@ -265,29 +560,47 @@ class TMTree:
         Always round up the amount to change, so that it's an int, and
         some change is made.
 
+        The data_size of every ancestor of this tree is updated by the same
+        amount.
+
         Do nothing if this tree is not a leaf.
         """
         if self.is_empty():
             pass
+        self._load_subtrees()
         if self._subtrees == [] and self.data_size > 1:
+            old_size = self.data_size
             result = math.ceil(self.data_size * abs(factor))
             if factor > 0:
                 self.data_size = self.data_size + result
             else:
                 self.data_size = max((self.data_size - result), 1)
-            parent = self._parent_tree
-            while parent is not None:
-                if factor > 0:
-                    self._parent_tree.data_size += result
-                else:
-                    self._parent_tree.data_size -= result
-                parent = parent._parent_tree
+            self._update_ancestor_sizes(self.data_size - old_size)
+
+    def _load_subtrees(self) -> None:
+        """Make sure the subtrees of this tree are in _subtrees.
+
+        A TMTree always has all of its subtrees; subclasses that only build
+        their subtrees when they are needed override this.
+        """
+
+    def _update_ancestor_sizes(self, delta: int) -> None:
+        """Add <delta> to the data_size of every ancestor of this tree, and
+        mark this tree and its ancestors as needing a new layout.
+        """
+        self._dirty = True
+        parent = self._parent_tree
+        while parent is not None:
+            parent.data_size += delta
+            parent._dirty = True
+            parent = parent._parent_tree
 
     def expand(self) -> None:
         """Change the _expand of a tree into True
         """
         if self.is_empty():
             pass
+        self._load_subtrees()
         if self._subtrees != []:
             self._expanded = True
             # parent = self._parent_tree
@@ -298,24 +611,23 @@ class TMTree:
     def expand_all(self) -> None:
         """Change the _expand of a tree and its descendants into True
         """
-        if self.is_empty():
-            pass
-        if self._subtrees != []:
-            self.expand()
-        for item in self._subtrees:
-            item.expand_all()
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            tree._load_subtrees()
+            if tree._subtrees != []:
+                tree.expand()
+            stack.extend(tree._subtrees)
 
     def collapse(self) -> None:
         """Change the _expand of a tree and its descendants into False
         """
-        if self.is_empty():
-            pass
-        elif self._subtrees == []:
-            self._expanded = False
-        else:
-            for item in self._subtrees:
-                item.collapse()
-            self._expanded = False
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if not tree.is_empty():
+                tree._expanded = False
+                stack.extend(tree._subtrees)
         if self._parent_tree is not None:
             self._parent_tree._expanded = False
 
@@ -335,17 +647,43 @@ class TMTree:
         and its ancestors, using the separator for this tree between each
         tree's name. If <final_node>, then add the suffix for the tree.
         """
-        if self._parent_tree is None:
-            path_str = self._name
-            if final_node:
-                path_str += self.get_suffix()
-            return path_str
-        else:
-            path_str = (self._parent_tree.get_path_string(False) +
-                        self.get_separator() + self._name)
-            if final_node or len(self._subtrees) == 0:
-                path_str += self.get_suffix()
-            return path_str
+        path_str = self._get_path_prefix()
+        if final_node or (self._parent_tree is not None and
+                          len(self._subtrees) == 0):
+            path_str += self.get_suffix()
+        return path_str
+
+    def _get_path_prefix(self) -> str:
+        """Return the path to this tree without its suffix, and remember it
+        in _path_prefix.
+
+        Only the names below the closest ancestor whose prefix is remembered
+        are joined, so building the paths of a tree's nodes parents first
+        takes time proportional to the length of the paths.
+        """
+        if self._path_prefix is None:
+            parts = []
+            tree = self
+            while tree._path_prefix is None and tree._parent_tree is not None:
+                parts.append(tree._name)
+                parts.append(tree.get_separator())
+                tree = tree._parent_tree
+            if tree._path_prefix is None:
+                parts.append(tree._name)
+            else:
+                parts.append(tree._path_prefix)
+            self._path_prefix = ''.join(reversed(parts))
+        return self._path_prefix
+
+    def _discard_path_prefixes(self) -> None:
+        """Forget the remembered path prefixes of this tree and its
+        descendants, after this tree was given a new parent.
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            tree._path_prefix = None
+            stack.extend(tree._subtrees)
 
     def get_separator(self) -> str:
         """Return the string used to separate names in the string
@@ -360,6 +698,285 @@ class TMTree:
         raise NotImplementedError
 
 
+def _slice_and_dice(rect: Tuple[int, int, int, int], sizes: List[int],
+                    total: int) -> List[Tuple[int, int, int, int]]:
+    """Return the rectangles for subtrees of the given <sizes> laid out side by
+    side along the longer side of <rect>, in order.
+
+    Each subtree gets a share of <rect> proportional to its size out of
+    <total>, rounded down; the last subtree absorbs the rounding remainder.
+    """
+    x, y, width, height = rect
+    result = []
+    offset = 0
+    if width > height:
+        for size in sizes[:-1]:
+            length = int(size / total * width)
+            result.append((x + offset, y, length, height))
+            offset += length
+        result.append((x + offset, y, width - offset, height))
+    else:
+        for size in sizes[:-1]:
+            length = int(size / total * height)
+            result.append((x, y + offset, width, length))
+            offset += length
+        result.append((x, y + offset, width, height - offset))
+    return result
+
+
+def _squarified(rect: Tuple[int, int, int, int], sizes: List[int],
+                total: int) -> List[Tuple[int, int, int, int]]:
+    """Return the rectangles for subtrees of the given <sizes> laid out with
+    the squarified treemap algorithm (Bruls, Huizing and van Wijk), which keeps
+    each rectangle's aspect ratio close to 1.
+
+    Subtrees are placed from largest to smallest in rows along the shorter
+    side of the remaining space. Rectangle edges are rounded to the nearest
+    pixel, so neighbouring rectangles share edges exactly and together fill
+    <rect>. Subtrees of size 0 get an empty rectangle. <total> is unused, as
+    the rectangles always fill <rect>, except when <rect> has no area: then
+    there are no squares to make, and it is sliced like _slice_and_dice does.
+    """
+    x, y, width, height = rect
+    if width <= 0 or height <= 0:
+        return _slice_and_dice(rect, sizes, total)
+    result = [(x, y, 0, 0)] * len(sizes)
+    order = sorted((i for i in range(len(sizes)) if sizes[i] > 0),
+                   key=lambda i: sizes[i], reverse=True)
+    size_sum = sum(sizes[i] for i in order)
+    if size_sum == 0:
+        return result
+
+    scale = width * height / size_sum
+    bounds = (float(x), float(y), float(x + width), float(y + height))
+    row = []
+    placed = 0
+    for i in order:
+        area = sizes[i] * scale
+        side = min(bounds[2] - bounds[0], bounds[3] - bounds[1])
+        if row and _worst_ratio(row + [area], side) > _worst_ratio(row, side):
+            bounds = _place_row(row, bounds, False, result,
+                                order[placed:placed + len(row)])
+            placed += len(row)
+            row = []
+        row.append(area)
+    _place_row(row, bounds, True, result, order[placed:])
+    return result
+
+
+def _worst_ratio(areas: List[float], side: float) -> float:
+    """Return the worst aspect ratio of rectangles with the given <areas>
+    placed in one row along a side of length <side>.
+
+    <areas> is sorted in decreasing order.
+    """
+    row_area = sum(areas)
+    if side <= 0 or row_area <= 0:
+        return math.inf
+    side_squared = side * side
+    return max(side_squared * areas[0] / (row_area * row_area),
+               row_area * row_area / (side_squared * areas[-1]))
+
+
+def _place_row(areas: List[float],
+               bounds: Tuple[float, float, float, float], last: bool,
+               result: List[Tuple[int, int, int, int]],
+               order: List[int]) -> Tuple[float, float, float, float]:
+    """Place rectangles with the given <areas> in one row along the shorter
+    side of the free space <bounds>, given as (left, top, right, bottom), and
+    return the free space that remains.
+
+    The rectangle for areas[i] is stored at result[order[i]]. If <last>, the
+    row takes up all of <bounds>.
+    """
+    left, top, right, bottom = bounds
+    row_area = sum(areas)
+    if right - left >= bottom - top:
+        # A column against the left edge, filled from top to bottom.
+        edge = right if last else left + row_area / (bottom - top)
+        start = top
+        for i in range(len(areas)):
+            end = bottom if i == len(areas) - 1 else \
+                start + areas[i] / (edge - left)
+            result[order[i]] = _round_rect(left, start, edge, end)
+            start = end
+        return edge, top, right, bottom
+    else:
+        # A row against the top edge, filled from left to right.
+        edge = bottom if last else top + row_area / (right - left)
+        start = left
+        for i in range(len(areas)):
+            end = right if i == len(areas) - 1 else \
+                start + areas[i] / (edge - top)
+            result[order[i]] = _round_rect(start, top, end, edge)
+            start = end
+        return left, edge, right, bottom
+
+
+def _round_rect(left: float, top: float, right: float,
+                bottom: float) -> Tuple[int, int, int, int]:
+    """Return the pygame rectangle whose edges are those given, rounded to the
+    nearest pixel.
+    """
+    x, y = round(left), round(top)
+    return x, y, round(right) - x, round(bottom) - y
+
+
+# The layout engines update_rectangles can use, by name. An engine takes the
+# rectangle to fill, the sizes of the subtrees to place in it, and the total
+# size they are a share of, and returns one rectangle per subtree, in order.
+LAYOUT_ENGINES: Dict[str, Callable[[Tuple[int, int, int, int], List[int], int],
+                                   List[Tuple[int, int, int, int]]]] = {
+    SLICE_AND_DICE: _slice_and_dice,
+    SQUARIFIED: _squarified
+}
+
+
+class _LayoutState:
+    """The layout settings of a whole tree, and what is kept about its
+    current layout, held by its root; see TMTree._state.
+
+    === Public Attributes ===
+    layout:
+        The name of the layout engine in LAYOUT_ENGINES the tree is laid out
+        with.
+    min_area:
+        The minimum area the tree is laid out with; see TMTree._min_area.
+    position_index:
+        The index used by get_tree_at_position to find the displayed leaf at
+        a position, or None if it has not been built since the rectangles or
+        the tree last changed.
+    lookups:
+        The number of lookups get_tree_at_position answered without the
+        index since then.
+    """
+
+    __slots__ = ('layout', 'min_area', 'position_index', 'lookups')
+
+    layout: str
+    min_area: int
+    position_index: Optional[_PositionIndex]
+    lookups: int
+
+    def __init__(self) -> None:
+        """Initialize the state of a tree that has not been laid out: with
+        slice-and-dice, no minimum area and no position index.
+        """
+        self.layout = SLICE_AND_DICE
+        self.min_area = 0
+        self.position_index = None
+        self.lookups = 0
+
+
+class _PositionIndex:
+    """A uniform grid over the rectangles in the displayed-tree rooted at a
+    tree, used to find the leaf at a position without walking the tree.
+
+    Trees whose subtrees were placed by slice-and-dice are not broken up in
+    the grid: their subtrees are found with a binary search over _offsets,
+    which is faster, and their slivers would each touch a whole row or column
+    of cells. The grid holds the other displayed leaves, and those trees.
+
+    The grid has about as many cells as it holds rectangles, and each cell
+    lists the rectangles that touch it, so a lookup only checks a handful of
+    them. Rectangles with no area are left out, as any position on one is
+    also on the edge of a rectangle next to it. If the rectangles would still
+    be listed in more than MAX_CELL_ENTRIES_PER_TREE cells each on average,
+    no grid is built and lookups walk the tree.
+
+    === Private Attributes ===
+    _tree:
+        The root of the displayed-tree.
+    _trees:
+        The trees in the grid, in the order get_rectangles returns the leaves
+        in them.
+    _origin:
+        The top-left corner of the area covered by the grid.
+    _cell_size:
+        The width and height of each cell.
+    _columns:
+        The number of columns of cells.
+    _rows:
+        The number of rows of cells.
+    _cells:
+        For each cell, row by row, the indices in _trees of the trees whose
+        rectangle, including its edges, touches the cell, in increasing order,
+        or None if there is no grid.
+    """
+
+    _tree: TMTree
+    _trees: List[TMTree]
+    _origin: Tuple[int, int]
+    _cell_size: Tuple[int, int]
+    _columns: int
+    _rows: int
+    _cells: Optional[List[List[int]]]
+
+    def __init__(self, tree: TMTree) -> None:
+        """Build the index for the displayed-tree rooted at <tree>, using the
+        rectangles it was last laid out with.
+        """
+        self._tree = tree
+        self._trees = []
+        min_area = tree._min_area
+        stack = [tree]
+        while stack:
+            item = stack.pop()
+            if not item._shows_subtrees(min_area) or \
+                    item._offsets is not None:
+                self._trees.append(item)
+            else:
+                stack.extend(reversed(item._subtrees))
+
+        x, y, width, height = tree.rect
+        width, height = max(width, 1), max(height, 1)
+        self._origin = (x, y)
+        self._columns = max(1, min(width, round(
+            math.sqrt(len(self._trees) * width / height))))
+        self._rows = max(1, min(height, round(
+            len(self._trees) / self._columns)))
+        self._cell_size = (math.ceil(width / self._columns),
+                           math.ceil(height / self._rows))
+        self._cells = [[] for _ in range(self._columns * self._rows)]
+        entries_left = MAX_CELL_ENTRIES_PER_TREE * len(self._trees)
+        for i in range(len(self._trees)):
+            left, top, w, h = self._trees[i].rect
+            if w == 0 or h == 0:
+                continue
+            first_column, first_row = self._cell((left, top))
+            last_column, last_row = self._cell((left + w, top + h))
+            entries_left -= (last_row - first_row + 1) * \
+                (last_column - first_column + 1)
+            if entries_left < 0:
+                self._cells = None
+                return
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    self._cells[row * self._columns + column].append(i)
+
+    def _cell(self, pos: Tuple[int, int]) -> Tuple[int, int]:
+        """Return the column and row of the cell containing <pos>, clamped to
+        the grid.
+        """
+        column = (pos[0] - self._origin[0]) // self._cell_size[0]
+        row = (pos[1] - self._origin[1]) // self._cell_size[1]
+        return (min(max(column, 0), self._columns - 1),
+                min(max(row, 0), self._rows - 1))
+
+    def lookup(self, pos: Tuple[int, int]) -> Optional[TMTree]:
+        """Return the first leaf, in the order get_rectangles returns them,
+        whose rectangle contains <pos>, or None if there is none.
+        """
+        if self._cells is None:
+            return self._tree.get_tree_at_position_he(pos)
+        column, row = self._cell(pos)
+        for i in self._cells[row * self._columns + column]:
+            x, y, width, height = self._trees[i].rect
+            if x <= pos[0] <= x + width and y <= pos[1] <= y + height:
+                return self._trees[i].get_tree_at_position_he(pos)
+        return None
+
+
 class FileSystemTree(TMTree):
     """A tree representation of files and folders in a file system.
 
@@ -371,30 +988,99 @@ class FileSystemTree(TMTree):
 
     The data_size attribute for regular files is simply the size of the file,
     as reported by os.path.getsize.
+
+    Folders are read with os.scandir, which reports whether each entry is a
+    folder along with its name, so only files need a stat call for their size.
+
+    === Private Attributes ===
+    _unloaded:
+        If this is a folder whose subtrees have not been built yet, its path
+        and a table of the total size of the folders under it, by path.
+        Otherwise, None.
+
+    === Representation Invariants ===
+    - If _unloaded is not None, then _subtrees is empty and _expanded is
+      False.
     """
 
-    def __init__(self, path: str) -> None:
+    __slots__ = ('_unloaded',)
+
+    _unloaded: Optional[Tuple[str, Dict[str, int]]]
+
+    def __init__(self, path: str, workers: int = 1,
+                 cache_file: Optional[str] = None, lazy: bool = False) -> None:
         """Store the file tree structure contained in the given file or folder.
 
+        If <workers> is greater than 1, read up to that many folders at the
+        same time on a pool of threads. This helps when reading a folder is
+        slow, e.g. on a network file system. The tree is the same either way.
+
+        If <cache_file> is given, the listing of every folder scanned is saved
+        there, along with the folder's modification time and inode number.
+        On the next scan, a folder whose modification time and inode are
+        unchanged is not read again; its saved listing is used instead.
+        Note that changing a file's contents does not change the modification
+        time of its folder, so the saved size of such a file is kept until
+        the folder itself changes.
+
+        If <lazy>, only the total size of each folder is kept from the scan,
+        and the subtrees of a folder are built the first time it is expanded.
+
         Precondition: <path> is a valid path for this computer.
         """
-        # Remember that you should recursively go through the file system
-        # and create new FileSystemTree objects for each file and folder
-        # encountered.
-        #
-        # Also remember to make good use of the superclass constructor!
+        self._unloaded = None
         if not os.path.isdir(path):
             TMTree.__init__(self, os.path.basename(path), [],
                             os.path.getsize(path))
+            return
+        cache = None if cache_file is None else _load_scan_cache(cache_file)
+        listings = _read_folders(path, workers, cache)
+        if cache is not None:
+            _save_scan_cache(cache_file, cache)
+        if lazy:
+            sizes = _folder_sizes(listings)
+            TMTree.__init__(self, os.path.basename(path), [], sizes.pop(path))
+            self._unloaded = (path, sizes)
         else:
-            path_list = os.listdir(path)
-            folder_subtree = []
-            size = 0
-            for item in path_list:
-                temp_path = os.path.join(path, item)
-                folder_subtree.append(FileSystemTree(temp_path))
-                size += os.path.getsize(temp_path)
-            TMTree.__init__(self, os.path.basename(path), folder_subtree, size)
+            TMTree.__init__(self, os.path.basename(path),
+                            _build_subtrees(path, listings))
+
+    def _load_subtrees(self) -> None:
+        """Build the subtrees of this folder if they have not been built yet,
+        and lay them out in its rectangle.
+
+        The folder is read again, so if its contents changed since the scan,
+        the data_size of this tree and its ancestors is updated to match. A
+        folder that can no longer be read, e.g. because it was deleted, is
+        treated as empty.
+        """
+        if self._unloaded is None:
+            return
+        path, sizes = self._unloaded
+        self._unloaded = None
+        try:
+            listing = _read_folder(path, None)[1]
+        except OSError:
+            listing = []
+        subtrees = []
+        for name, is_folder, size in listing:
+            if is_folder:
+                subpath = os.path.join(path, name)
+                subtree = _make_file_system_tree(name, [],
+                                                 sizes.pop(subpath, 0))
+                subtree._unloaded = (subpath, sizes)
+            else:
+                subtree = _make_file_system_tree(name, [], size)
+            subtree._parent_tree = self
+            subtrees.append(subtree)
+        self._subtrees = subtrees
+        total = sum(subtree.data_size for subtree in subtrees)
+        if total != self.data_size:
+            old_size = self.data_size
+            self.data_size = total
+            self._update_ancestor_sizes(total - old_size)
+        self._layout_subtrees(self.rect, self._layout, self._min_area)
+        self._discard_position_index()
 
     def get_separator(self) -> str:
         """Return the file separator for this OS.
@@ -404,16 +1090,176 @@ class FileSystemTree(TMTree):
     def get_suffix(self) -> str:
         """Return the final descriptor of this tree.
         """
-        if len(self._subtrees) == 0:
+        if len(self._subtrees) == 0 and self._unloaded is None:
             return ' (file)'
         else:
             return ' (folder)'
 
 
+def _read_folders(path: str, workers: int, cache: Optional[Dict[str, list]],
+                  report: Optional[Callable[[str, List[Tuple[str, bool, int]]],
+                                            None]] = None) \
+        -> Dict[str, Tuple[Optional[List[int]], List[Tuple[str, bool, int]]]]:
+    """Return the [modification time, inode] and listing of the folder at
+    <path> and every folder under it, as returned by _read_folder, by path.
+    Up to <workers> folders are read at a time.
+
+    A folder is only read after its parent, so it always comes after its
+    parent in the returned dict. If <report> is not None, it is called with
+    the path and listing of each folder as soon as it is read, in the same
+    order.
+
+    If <cache> is not None, it maps the absolute path of folders to their
+    [modification time, inode] and their listing, as saved by an earlier
+    scan. Folders that did not change since are not read again, and <cache>
+    is updated with the folders under <path> as they are now.
+    """
+    listings = {}
+    if workers <= 1:
+        pending = [path]
+        while pending:
+            folder = pending.pop()
+            listings[folder] = _read_folder(folder, cache)
+            if report is not None:
+                report(folder, listings[folder][1])
+            pending.extend(_subfolders(folder, listings[folder][1]))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {pool.submit(_read_folder, path, cache): path}
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    folder = running.pop(future)
+                    listings[folder] = future.result()
+                    if report is not None:
+                        report(folder, listings[folder][1])
+                    for subfolder in _subfolders(folder, listings[folder][1]):
+                        running[pool.submit(_read_folder, subfolder,
+                                            cache)] = subfolder
+
+    if cache is not None:
+        prefix = os.path.join(os.path.abspath(path), '')
+        for folder in [folder for folder in cache
+                       if folder.startswith(prefix)]:
+            del cache[folder]
+        for folder, (stamp, listing) in listings.items():
+            cache[os.path.abspath(folder)] = [stamp, listing]
+    return listings
+
+
+def _build_subtrees(path: str, listings: Dict[str, tuple]) \
+        -> List[FileSystemTree]:
+    """Return a tree for each file and folder in the folder at <path>, in
+    listing order, from the <listings> returned by _read_folders.
+    """
+    # Build the trees bottom-up, so every subfolder is built before the
+    # folder that contains it.
+    built = {}
+    for folder in reversed(list(listings)):
+        subtrees = []
+        for name, is_folder, size in listings[folder][1]:
+            if is_folder:
+                subtrees.append(_make_file_system_tree(
+                    name, built.pop(os.path.join(folder, name))))
+            else:
+                subtrees.append(_make_file_system_tree(name, [], size))
+        built[folder] = subtrees
+    return built[path]
+
+
+def _folder_sizes(listings: Dict[str, tuple]) -> Dict[str, int]:
+    """Return the total size of the files in each folder in the <listings>
+    returned by _read_folders and in the folders under it, by path.
+    """
+    sizes = {}
+    for folder in reversed(list(listings)):
+        total = 0
+        for name, is_folder, size in listings[folder][1]:
+            if is_folder:
+                total += sizes[os.path.join(folder, name)]
+            else:
+                total += size
+        sizes[folder] = total
+    return sizes
+
+
+def _make_file_system_tree(name: str, subtrees: List[FileSystemTree],
+                           data_size: int = 0) -> FileSystemTree:
+    """Return a FileSystemTree with the given <name>, <subtrees> and
+    <data_size>, without reading the file system.
+    """
+    tree = FileSystemTree.__new__(FileSystemTree)
+    TMTree.__init__(tree, name, subtrees, data_size)
+    tree._unloaded = None
+    return tree
+
+
+def _read_folder(path: str, cache: Optional[Dict[str, list]]) \
+        -> Tuple[Optional[List[int]], List[Tuple[str, bool, int]]]:
+    """Return the [modification time, inode] of the folder at <path> and its
+    listing: the name of each entry, whether it is a folder, and its size if
+    it is a file (0 otherwise), in the order os.scandir lists them.
+
+    If <cache> is None, the modification time and inode are not looked up and
+    None is returned for them. Otherwise, if the listing saved in <cache> for
+    this folder has the same modification time and inode, it is returned
+    without reading the folder.
+    """
+    stamp = None
+    if cache is not None:
+        info = os.stat(path)
+        stamp = [info.st_mtime_ns, info.st_ino]
+        cached = cache.get(os.path.abspath(path))
+        if cached is not None and cached[0] == stamp:
+            return stamp, cached[1]
+    listing = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                listing.append((entry.name, True, 0))
+            else:
+                listing.append((entry.name, False, entry.stat().st_size))
+    return stamp, listing
+
+
+def _load_scan_cache(cache_file: str) -> Dict[str, list]:
+    """Return the folder listings saved in <cache_file>, or an empty dict if it
+    does not exist or cannot be read.
+    """
+    try:
+        with open(cache_file) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_scan_cache(cache_file: str, cache: Dict[str, list]) -> None:
+    """Save the folder listings in <cache> to <cache_file>.
+
+    The file is replaced in one step, so an interrupted save leaves the
+    previous cache in place.
+    """
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(cache, file)
+    os.replace(temp_file, cache_file)
+
+
+def _subfolders(path: str, listing: List[Tuple[str, bool, int]]) -> List[str]:
+    """Return the paths of the folders in <listing>, the listing of the folder
+    at <path>.
+    """
+    return [os.path.join(path, name) for name, is_folder, _ in listing
+            if is_folder]
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'math', 'random', 'os', '__future__'
-        ]
+            'python_ta', 'typing', 'math', 'random', 'os', 'json', 'bisect',
+            'concurrent.futures', '__future__'
+        ],
+        'allowed-io': ['_load_scan_cache', '_save_scan_cache']
     })
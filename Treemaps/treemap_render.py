@@ -0,0 +1,92 @@
+"""Assignment 2: Headless treemap rendering
+
+=== Module Description ===
+This module draws treemaps straight to image files instead of showing them in
+an interactive window, so that they can be made on machines without a
+display, such as servers producing nightly reports. Many treemaps can be drawn
+at the same time, each in its own process.
+"""
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+import pygame
+from tm_trees import TMTree, FileSystemTree, SLICE_AND_DICE
+from papers import PaperTree
+from treemap_visualiser import draw_treemap, MIN_RECT_AREA
+
+# The width and height of the images, in pixels, unless others are given.
+IMAGE_SIZE = (1920, 1080)
+
+
+def render_tree(tree: TMTree, filename: str,
+                size: Tuple[int, int] = IMAGE_SIZE,
+                layout: str = SLICE_AND_DICE) -> None:
+    """Draw the treemap of <tree> in an image of the given <size> and save it
+    to <filename>.
+
+    Every subtree of <tree> is expanded first, so the image shows all of its
+    leaves, except inside folders culled for being smaller than
+    MIN_RECT_AREA pixels. <layout> names the layout engine in
+    tm_trees.LAYOUT_ENGINES to use. The image format is chosen from the
+    extension of <filename>, e.g. .png.
+    """
+    tree.expand_all()
+    tree.update_rectangles((0, 0, size[0], size[1]), layout, MIN_RECT_AREA)
+    pygame.image.save(draw_treemap(tree, size), filename)
+
+
+def render_file_system(path: str, filename: str,
+                       size: Tuple[int, int] = IMAGE_SIZE,
+                       layout: str = SLICE_AND_DICE, workers: int = 1,
+                       cache_file: Optional[str] = None) -> str:
+    """Draw the treemap of the files and folders at <path> to the image
+    <filename>, like render_tree, and return <filename>.
+
+    <workers> and <cache_file> are passed on to FileSystemTree.
+
+    Precondition: <path> is a valid path to a file or folder.
+    """
+    render_tree(FileSystemTree(path, workers, cache_file), filename, size,
+                layout)
+    return filename
+
+
+def render_papers(filename: str, size: Tuple[int, int] = IMAGE_SIZE,
+                  layout: str = SLICE_AND_DICE, by_year: bool = False) -> str:
+    """Draw the treemap of the CS Education research papers data to the image
+    <filename>, like render_tree, and return <filename>.
+
+    <by_year> is passed on to PaperTree.
+    """
+    render_tree(PaperTree('CS1', [], all_papers=True, by_year=by_year),
+                filename, size, layout)
+    return filename
+
+
+def render_file_systems(jobs: List[Tuple[str, str]],
+                        size: Tuple[int, int] = IMAGE_SIZE,
+                        layout: str = SLICE_AND_DICE,
+                        processes: Optional[int] = None) -> List[str]:
+    """Draw the treemap of the files and folders at each path in <jobs> to the
+    image file paired with it, and return the image files in the same order.
+
+    The treemaps are drawn in parallel by <processes> processes, or by one per
+    CPU if <processes> is None. Each process scans and draws whole trees, so
+    only the file names are sent between processes.
+
+    Precondition: each path in <jobs> is a valid path to a file or folder.
+    """
+    with Pool(processes) as pool:
+        return pool.starmap(render_file_system,
+                            [(path, filename, size, layout)
+                             for path, filename in jobs])
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'multiprocessing', 'pygame', 'tm_trees',
+            'papers', 'treemap_visualiser'
+        ],
+        'generated-members': 'pygame.*'
+    })
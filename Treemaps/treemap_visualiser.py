@@ -17,10 +17,18 @@ concrete subclass, of course), rendering it to the user using pygame,
 and detecting user events like mouse clicks and key presses and responding
 to them.
 """
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
 import pygame
-from tm_trees import TMTree, FileSystemTree
+from tm_trees import TMTree, FileSystemTree, SLICE_AND_DICE
 from papers import PaperTree
+from tm_store import TMStore
+from tm_scan import FileSystemScan
+from tm_layout import BackgroundLayout
+try:
+    import tm_raster
+except ImportError:
+    tm_raster = None
 
 
 # Screen dimensions and coordinates
@@ -33,140 +41,418 @@ TREEMAP_HEIGHT = HEIGHT - FONT_HEIGHT  # The height of the treemap display.
 
 # Font to use for the treemap program.
 FONT_FAMILY = 'Consolas'
+# The number of rendered texts for the text display kept for reuse.
+TEXT_CACHE_SIZE = 64
 
+# Folders whose rectangle has fewer pixels than this are drawn as one
+# rectangle instead of laying out and drawing everything inside them.
+MIN_RECT_AREA = 4
 
-def run_visualisation(tree: TMTree) -> None:
+# While a folder is scanned in the background, the number of milliseconds
+# between adding what was read to the treemap and drawing it again, and the
+# most seconds to spend adding it each time.
+SCAN_REFRESH_TIME = 250
+SCAN_UPDATE_TIME = 0.05
+
+# The number of seconds to wait for the tree to be laid out after it changed
+# before handling other events while it is laid out in the background, and
+# the type of the event posted when such a layout is finished.
+LAYOUT_WAIT_TIME = 0.05
+LAYOUT_EVENT = pygame.USEREVENT
+
+
+def run_visualisation(tree: TMTree, layout: str = SLICE_AND_DICE,
+                      scan: Optional[FileSystemScan] = None) -> None:
     """Display an interactive graphical display of the given tree's treemap.
+
+    <layout> names the layout engine in tm_trees.LAYOUT_ENGINES to use. The
+    tree remembers it, and MIN_RECT_AREA, so they are used again whenever the
+    tree is laid out.
+
+    If <scan> is not None, <tree> is its tree, and is shown while the scan
+    adds to it; see event_loop.
     """
 
     # Setup pygame
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = _start_pygame()
 
-    # Render the initial display of the static treemap.
-    render_display(screen, tree, None, None)
-    tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
+    tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT), layout,
+                           MIN_RECT_AREA)
 
     # Start an event loop to respond to events.
-    event_loop(screen, tree)
+    event_loop(screen, tree, scan)
+
+
+def _start_pygame() -> pygame.Surface:
+    """Initialize pygame and return the screen to draw on.
+
+    Fonts do not outlive pygame.quit, so the font and text surfaces cached
+    during an earlier session are dropped.
+    """
+    pygame.init()
+    _get_font.cache_clear()
+    _get_text_surface.cache_clear()
+    return pygame.display.set_mode((WIDTH, HEIGHT))
 
 
 def render_display(screen: pygame.Surface, tree: Optional[TMTree],
                    selected_node: Optional[TMTree],
-                   hover_node: Optional[TMTree]) -> None:
+                   hover_node: Optional[TMTree],
+                   text: Optional[str] = None,
+                   pixels: Optional['tm_raster.PixelMap'] = None) \
+        -> Tuple[pygame.Surface, List[pygame.Rect]]:
     """Render a treemap and text display to the given screen.
 
     Use the constants TREEMAP_HEIGHT and FONT_HEIGHT to divide the
     screen vertically into the treemap and text comments.
+
+    The text display shows <text>, or the display text of <selected_node> if
+    <text> is None. <pixels> is passed on to draw_treemap.
+
+    Return the off-screen surface the treemap was drawn on, and the regions
+    of the screen the selection and hover borders were drawn over, so that
+    render_changes can later redraw the borders and text without drawing the
+    treemap again.
     """
-    # First, clear the screen
-    pygame.draw.rect(screen, pygame.color.THECOLORS['black'],
-                     (0, 0, WIDTH, HEIGHT))
+    treemap = draw_treemap(tree, (WIDTH, TREEMAP_HEIGHT), pixels)
+    screen.blit(treemap, ORIGIN)
+    borders = _render_borders(screen, selected_node, hover_node)
 
-    subscreen = screen.subsurface((0, 0, WIDTH, TREEMAP_HEIGHT))
+    # TODO: Uncomment this after you have completed Task 2
+    if text is None:
+        text = _get_display_text(selected_node)
+    _render_text(screen, text)
+
+    # This must be called *after* all other pygame functions have run.
+    pygame.display.flip()
+    return treemap, borders
+
+
+def draw_treemap(tree: TMTree, size: Tuple[int, int],
+                 pixels: Optional['tm_raster.PixelMap'] = None) \
+        -> pygame.Surface:
+    """Return a new off-screen surface of the given <size> with the
+    displayed-tree of <tree> drawn on a black background, using the rectangles
+    it was last laid out with.
+
+    This needs no display, so it also works without a window.
+
+    If NumPy is installed, the pixels are worked out with tm_raster and copied
+    onto the surface at once, which is much faster than drawing many
+    rectangles one by one. They are taken from <pixels>, the PixelMap of the
+    tree at this <size>, if it is given, and worked out again otherwise.
+    """
+    treemap = pygame.Surface(size)
+    if pixels is None:
+        pixels = _get_pixel_map(tree, size)
+    if pixels is not None:
+        pygame.surfarray.blit_array(treemap, pixels.pixel_colours(
+            pygame.color.THECOLORS['black'][:3]))
+        return treemap
+    treemap.fill(pygame.color.THECOLORS['black'])
 
     # TODO: Uncomment this afer you have completed Task 2
-    for rect, colour in tree.get_rectangles():
+    for rect, colour in tree.iter_rectangles():
         # Note that the arguments are in the opposite order
-        pygame.draw.rect(subscreen, colour, rect)
+        pygame.draw.rect(treemap, colour, rect)
+    return treemap
+
+
+def _get_pixel_map(tree: TMTree, size: Tuple[int, int] =
+                   (WIDTH, TREEMAP_HEIGHT)) -> Optional['tm_raster.PixelMap']:
+    """Return the PixelMap of the treemap of <tree> at the given <size>, or
+    None if NumPy is not installed.
+    """
+    if tm_raster is None:
+        return None
+    return tm_raster.PixelMap(tree, size)
+
+
+def _get_leaf_at(tree: TMTree, pixels: Optional['tm_raster.PixelMap'],
+                 pos: Tuple[int, int]) -> Optional[TMTree]:
+    """Return the leaf of <tree> at the position <pos> of the screen, or None
+    if there is none.
+
+    The leaf is read from <pixels>, the PixelMap of the treemap of <tree>, if
+    there is one, and found by walking <tree> otherwise.
+    """
+    if pixels is None:
+        return tree.get_tree_at_position(pos)
+    return pixels.leaf_at(pos)
+
+
+def render_changes(screen: pygame.Surface, treemap: pygame.Surface,
+                   selected_node: Optional[TMTree],
+                   hover_node: Optional[TMTree],
+                   old_borders: List[pygame.Rect],
+                   text: Optional[str] = None) -> List[pygame.Rect]:
+    """Redraw the selection and hover borders and the text display on the
+    given screen, over the <treemap> returned by render_display, and return
+    the regions the new borders were drawn over.
+
+    The text display shows <text>, or the display text of <selected_node> if
+    <text> is None.
+
+    Only the regions that can have changed are drawn and sent to the display:
+    the <old_borders> returned by the last call to render_display or
+    render_changes, the new borders and the text display.
+    """
+    for region in old_borders:
+        screen.blit(treemap, region, region)
+    borders = _render_borders(screen, selected_node, hover_node)
+    if text is None:
+        text = _get_display_text(selected_node)
+    _render_text(screen, text)
+    pygame.display.update(old_borders + borders +
+                          [pygame.Rect(0, TREEMAP_HEIGHT, WIDTH, FONT_HEIGHT)])
+    return borders
+
+
+def _render_borders(screen: pygame.Surface, selected_node: Optional[TMTree],
+                    hover_node: Optional[TMTree]) -> List[pygame.Rect]:
+    """Draw the selection and hover borders on the treemap part of the given
+    screen, and return the regions they cover.
+    """
+    subscreen = screen.subsurface((0, 0, WIDTH, TREEMAP_HEIGHT))
+    borders = []
 
     # add the hover rectangle
     if selected_node is not None:
-        pygame.draw.rect(subscreen, (255, 255, 255), selected_node.rect, 5)
+        borders.append(pygame.draw.rect(subscreen, (255, 255, 255),
+                                        selected_node.rect, 5))
     if hover_node is not None:
-        pygame.draw.rect(subscreen, (255, 255, 255), hover_node.rect, 2)
-
-    # TODO: Uncomment this after you have completed Task 2
-    _render_text(screen, _get_display_text(selected_node))
-
-    # This must be called *after* all other pygame functions have run.
-    pygame.display.flip()
+        borders.append(pygame.draw.rect(subscreen, (255, 255, 255),
+                                        hover_node.rect, 2))
+    return borders
 
 
 def _render_text(screen: pygame.Surface, text: str) -> None:
-    """Render text at the bottom of the display.
+    """Render text at the bottom of the display, replacing what was there.
     """
-    # The font we want to use
-    font = pygame.font.SysFont(FONT_FAMILY, FONT_HEIGHT - 8)
-    text_surface = font.render(text, 1, pygame.color.THECOLORS['white'])
+    pygame.draw.rect(screen, pygame.color.THECOLORS['black'],
+                     (0, TREEMAP_HEIGHT, WIDTH, FONT_HEIGHT))
+
+    text_surface = _get_text_surface(text)
 
     # Where to render the text_surface
     text_pos = (0, HEIGHT - FONT_HEIGHT + 4)
     screen.blit(text_surface, text_pos)
 
 
-def event_loop(screen: pygame.Surface, tree: TMTree) -> None:
+@lru_cache(maxsize=None)
+def _get_font() -> pygame.font.Font:
+    """Return the font we want to use for the text display.
+
+    Looking up a system font is slow, so it is only done once.
+    """
+    return pygame.font.SysFont(FONT_FAMILY, FONT_HEIGHT - 8)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _get_text_surface(text: str) -> pygame.Surface:
+    """Return a surface with <text> rendered in the text display's font.
+
+    The most recently used surfaces are kept, so going back to a node that was
+    selected recently does not render its text again.
+    """
+    return _get_font().render(text, 1, pygame.color.THECOLORS['white'])
+
+
+def event_loop(screen: pygame.Surface, tree: TMTree,
+               scan: Optional[FileSystemScan] = None) -> Tuple[int, int]:
     """Respond to events (mouse clicks, key presses) and update the display.
 
     Note that the event loop is an *infinite loop*: it continually waits for
     the next event, determines the event's type, and then updates the state
     of the visualisation or the tree itself, updating the display if necessary.
     This loop ends only when the user closes the window.
+
+    The loop sleeps until there is an event. Events that arrive together are
+    handled together, so a burst of mouse motion only looks up the hovered
+    node once. The display is only rendered when the selected or hovered node
+    changed or the tree was changed, and the treemap itself is only drawn
+    again in the last case; see render_display and render_changes.
+
+    If NumPy is installed, the leaf under the mouse is read from the PixelMap
+    of the treemap, which is only made again when the tree was changed.
+
+    After the tree changes, it is laid out again by a BackgroundLayout, so
+    that the window keeps responding while a large tree is laid out. If the
+    layout takes more than LAYOUT_WAIT_TIME seconds, the loop goes back to
+    handling events, and draws the new rectangles once the layout posts a
+    LAYOUT_EVENT to say it is finished. If the tree changes again first, the
+    layout is cancelled and a new one started. The rectangles of a TMStore
+    are laid out straight away instead.
+
+    If <scan> is not None, <tree> is its tree. Until the scan is done, the
+    loop also wakes up every SCAN_REFRESH_TIME milliseconds to add the
+    folders read since to <tree>, lay out what changed and draw it, and the
+    text display shows how much has been scanned. While the tree is laid out
+    in the background, adding to it waits until the layout is finished, so
+    every layout started for the scan gets drawn. If the scan fails, what was
+    scanned before stays on display, and the text display shows the error.
+
+    Return the number of times the display was rendered and the number of
+    times events were handled without having to render it.
     """
+    treemap_rect = (0, 0, WIDTH, TREEMAP_HEIGHT)
+    layout = None
+    if isinstance(tree, TMTree):
+        layout = BackgroundLayout(tree, _post_layout_event)
     selected_node = None
+    scan_error = None
+    text = _get_display_text(None, scan)
+    last_scan_update = pygame.time.get_ticks() - SCAN_REFRESH_TIME
+    pixels = _get_pixel_map(tree)
+    hover_node = _get_leaf_at(tree, pixels, pygame.mouse.get_pos())
+    treemap, borders = render_display(screen, tree, None, hover_node, text,
+                                      pixels)
+    rendered, skipped = 1, 0
 
     while True:
-        # Wait for an event
-        event = pygame.event.poll()
-        if event.type == pygame.QUIT:
-            return
-
-        # get the hover position and the corresponding node
-        hover_node = tree.get_tree_at_position(pygame.mouse.get_pos())
-
-        if event.type == pygame.MOUSEBUTTONUP:
-            selected_node = \
-                _handle_click(event.button, event.pos, tree, selected_node)
-
-        elif event.type == pygame.KEYUP and selected_node is not None:
-            if event.key == pygame.K_UP:
-                pass
-                # TODO: Uncomment once you have completed Task 4
-                selected_node.change_size(0.01)
-                tree.update_data_sizes()
-                tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
-
-            elif event.key == pygame.K_DOWN:
-                pass
-                # TODO: Uncomment once you have completed Task 4
-                selected_node.change_size(-0.01)
-                tree.update_data_sizes()
-                tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
-
-            elif event.key == pygame.K_m:
-                pass
-                # TODO: Uncomment once you have completed Task 4
-                selected_node.move(hover_node)
-                tree.update_data_sizes()
-                tree.update_rectangles((0, 0, WIDTH, HEIGHT - FONT_HEIGHT))
-
-            elif event.key == pygame.K_e:
-                pass
-                # TODO: Uncomment once you have completed Task 5
-                selected_node.expand()
-
-            elif event.key == pygame.K_a:
-                pass
-                # TODO: Uncomment once you have completed Task 5
-                selected_node.expand_all()
-
-            elif event.key == pygame.K_c:
-                pass
-                # TODO: Uncomment once you have completed Task 5
-                selected_node.collapse()
-
-            elif event.key == pygame.K_x:
-                pass
-                # TODO: Uncomment once you have completed Task 5
-                selected_node.collapse_all()
+        # Wait for an event, then take the ones that are already queued too.
+        # While scanning, stop waiting in time to show what was read.
+        if scan is None or scan.done:
+            events = [pygame.event.wait()] + pygame.event.get()
+        else:
+            events = [pygame.event.wait(SCAN_REFRESH_TIME)] + \
+                pygame.event.get()
+        if any(event.type == pygame.QUIT for event in events):
+            if layout is not None:
+                layout.cancel()
+            return rendered, skipped
+
+        old_nodes = (selected_node, hover_node)
+        changed = redraw = relayout = False
+
+        # The tree must not change while it is laid out, so what was read is
+        # only added once the layout of what was added before is finished;
+        # cancelling it instead would never let a slow layout be drawn
+        if scan is not None and not scan.done and \
+                (layout is None or not layout.running()) and \
+                pygame.time.get_ticks() - last_scan_update >= SCAN_REFRESH_TIME:
+            last_scan_update = pygame.time.get_ticks()
+            if layout is not None and layout.publish():
+                changed = redraw = True
+            # The text display changes when the scan is done, even if the
+            # tree does not
+            try:
+                if scan.update(SCAN_UPDATE_TIME) or scan.done:
+                    relayout = True
+            except OSError as error:
+                # The scan is over, but the tree read so far is still usable
+                scan_error = error
+                relayout = True
+
+        # get the hover position and the corresponding node, once for all the
+        # mouse motion events
+        if any(event.type == pygame.MOUSEMOTION for event in events):
+            hover_node = _get_leaf_at(tree, pixels, pygame.mouse.get_pos())
+
+        for event in events:
+            if event.type == pygame.MOUSEBUTTONUP:
+                selected_node = _handle_click(
+                    event.button, _get_leaf_at(tree, pixels, event.pos),
+                    selected_node)
+
+            elif event.type == pygame.KEYUP and selected_node is not None:
+                # The tree must not change while it is laid out
+                if layout is not None and layout.cancel():
+                    relayout = True
+                if _handle_key(event.key, selected_node, hover_node):
+                    relayout = True
+
+            elif event.type == pygame.VIDEOEXPOSE:
+                # The window was uncovered, so draw all of it again
+                redraw = True
+
+        # Lay out the changed tree, and draw it once it is laid out
+        if relayout and layout is None:
+            tree.update_dirty_rectangles(treemap_rect)
+            changed = redraw = True
+        elif relayout:
+            layout.start(treemap_rect)
+            layout.wait(LAYOUT_WAIT_TIME)
+        if layout is not None and layout.publish():
+            changed = redraw = True
+
+        # The display text only changes with the selection or the tree
+        if redraw or selected_node is not old_nodes[0]:
+            text = _get_display_text(selected_node, scan, scan_error)
 
         # Update display
-        render_display(screen, tree, selected_node, hover_node)
+        if changed:
+            pixels = _get_pixel_map(tree)
+            hover_node = _get_leaf_at(tree, pixels, pygame.mouse.get_pos())
+        if redraw:
+            treemap, borders = render_display(screen, tree, selected_node,
+                                              hover_node, text, pixels)
+            rendered += 1
+        elif (selected_node, hover_node) != old_nodes:
+            borders = render_changes(screen, treemap, selected_node,
+                                     hover_node, borders, text)
+            rendered += 1
+        else:
+            skipped += 1
+
 
+def _post_layout_event(generation: int) -> None:
+    """Let the event loop know that the layout with the given <generation>
+    number is finished. This is called on the thread of the layout.
+    """
+    pygame.event.post(pygame.event.Event(LAYOUT_EVENT,
+                                         generation=generation))
+
+
+def _handle_key(key: int, selected_node: TMTree,
+                hover_node: Optional[TMTree]) -> bool:
+    """Apply the command for the given <key> to <selected_node>, and return
+    whether the tree changed, so it has to be laid out and drawn again.
+    """
+    if key == pygame.K_UP:
+        pass
+        # TODO: Uncomment once you have completed Task 4
+        selected_node.change_size(0.01)
+
+    elif key == pygame.K_DOWN:
+        pass
+        # TODO: Uncomment once you have completed Task 4
+        selected_node.change_size(-0.01)
+
+    elif key == pygame.K_m:
+        pass
+        # TODO: Uncomment once you have completed Task 4
+        selected_node.move(hover_node)
+
+    elif key == pygame.K_e:
+        pass
+        # TODO: Uncomment once you have completed Task 5
+        selected_node.expand()
+
+    elif key == pygame.K_a:
+        pass
+        # TODO: Uncomment once you have completed Task 5
+        selected_node.expand_all()
+
+    elif key == pygame.K_c:
+        pass
+        # TODO: Uncomment once you have completed Task 5
+        selected_node.collapse()
+
+    elif key == pygame.K_x:
+        pass
+        # TODO: Uncomment once you have completed Task 5
+        selected_node.collapse_all()
 
-def _handle_click(button: int, pos: Tuple[int, int], tree: TMTree,
+    else:
+        return False
+    return True
+
+
+def _handle_click(button: int, selected_leaf: Optional[TMTree],
                   old_selected_leaf: Optional[TMTree]) -> Optional[TMTree]:
-    """Return the new selection after handling the mouse event.
+    """Return the new selection after handling the mouse event, where
+    <selected_leaf> is the leaf that was clicked on, or None if there is none.
 
     We need to use old_selected_leaf to handle the case when the selected
     leaf is left-clicked again.
@@ -176,7 +462,6 @@ def _handle_click(button: int, pos: Tuple[int, int], tree: TMTree,
 
     # left mouse click
     if button == 1:
-        selected_leaf = tree.get_tree_at_position(pos)
         if selected_leaf is None:
             return old_selected_leaf
         elif selected_leaf is old_selected_leaf:
@@ -188,22 +473,59 @@ def _handle_click(button: int, pos: Tuple[int, int], tree: TMTree,
         return old_selected_leaf
 
 
-def _get_display_text(leaf: Optional[TMTree]) -> str:
-    """Return the display text of this leaf.
+def _get_display_text(leaf: Optional[TMTree],
+                      scan: Optional[FileSystemScan] = None,
+                      scan_error: Optional[OSError] = None) -> str:
+    """Return the display text of this leaf, followed by how much <scan> has
+    read if it is not done, or by <scan_error> if the scan failed with it.
     """
     if leaf is None:
-        return ''
+        text = ''
+    else:
+        text = leaf.get_path_string() + '  ({})'.format(leaf.data_size)
+    if scan is not None and not scan.done:
+        progress = 'Scanning: {} folders, {} files'.format(scan.folders_read,
+                                                           scan.files_found)
+    elif scan_error is not None:
+        progress = 'Scan failed: {}'.format(scan_error)
     else:
-        return leaf.get_path_string() + '  ({})'.format(leaf.data_size)
+        return text
+    return progress if text == '' else text + '  [' + progress + ']'
 
 
-def run_treemap_file_system(path: str) -> None:
+def run_treemap_file_system(path: str, workers: int = 1,
+                            cache_file: Optional[str] = None,
+                            lazy: bool = False,
+                            columnar: bool = False,
+                            background: bool = False) -> None:
     """Run a treemap visualisation for the given path's file structure.
 
+    <workers> is the number of folders to read at the same time while
+    scanning <path>, <cache_file> is where folder listings are kept between
+    runs, and <lazy> says whether to build each folder's subtrees only when
+    it is first expanded; see FileSystemTree.
+
+    If <columnar> is True, the tree is kept in a TMStore instead of as
+    TMTree objects, which takes much less memory for very large folders.
+    <lazy> is ignored in that case.
+
+    If <background> is True, the window opens straight away and <path> is
+    scanned in the background with a FileSystemScan, showing the files and
+    folders as they are read. <lazy> and <columnar> are ignored in that case.
+
     Precondition: <path> is a valid path to a file or folder.
     """
-    file_tree = FileSystemTree(path)
-    run_visualisation(file_tree)
+    if background:
+        scan = FileSystemScan(path, workers, cache_file)
+        try:
+            run_visualisation(scan.tree, scan=scan)
+        finally:
+            scan.stop()
+    elif columnar:
+        run_visualisation(
+            TMStore.from_file_system(path, workers, cache_file).root())
+    else:
+        run_visualisation(FileSystemTree(path, workers, cache_file, lazy))
 
 
 def run_treemap_papers() -> None:
@@ -220,7 +542,8 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'pygame', 'tm_trees', 'papers'
+            'python_ta', 'typing', 'functools', 'pygame', 'tm_trees',
+            'papers', 'tm_store', 'tm_raster', 'tm_scan', 'tm_layout'
         ],
         'generated-members': 'pygame.*'
     })